@@ -1,8 +1,13 @@
+import sys
 from enum import Enum
 from challonge import Account, ChallongeException
 
+from config import app_config
+from const import C_ChallongeTimeout
 from encoding import encoder
 from database.core import db
+from log import log_challonge
+from challonge_impl.breaker import breaker, ChallongeUnavailable
 
 
 class ChallongeAccess(Enum):
@@ -46,9 +51,63 @@ class InvalidCredentials(Exception):
         return '❌ Your Challonge credentials are not valid. Please set them again via the `username` and `key` commands'
 
 
+def _timeout(name, kwargs):
+    """Timeout of a request: none for those returning whole brackets or adding many participants,
+    which legitimately take long on big tournaments"""
+    if name == 'bulk_add' or kwargs.get('include_participants') or kwargs.get('include_matches'):
+        return None
+    return C_ChallongeTimeout
+
+
+class _GuardedEndpoint:
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+
+    def __getattr__(self, name):
+        attr = getattr(self._endpoint, name)
+        if not callable(attr):
+            return attr
+
+        async def guarded(*args, **kwargs):
+            return await breaker.call(attr, *args, timeout=_timeout(name, kwargs), **kwargs)
+        return guarded
+
+
+class GuardedAccount:
+    """Account whose requests all go through the Challonge circuit breaker"""
+    endpoints = ['tournaments', 'participants', 'matches', 'attachments']
+
+    def __init__(self, account):
+        self._account = account
+
+    def __getattr__(self, name):
+        attr = getattr(self._account, name)
+        if name in GuardedAccount.endpoints:
+            return _GuardedEndpoint(attr)
+        return attr
+
+
 challonge_accounts = []
 
 
+def set_api_url(api_url):
+    """Sends the requests of every account to another server (host[:port]/path, always over https)
+    such as the stand-in of standin.server. Returns the previous one
+    """
+    library = sys.modules[Account.__module__]
+    if not hasattr(library, 'CHALLONGE_API_URL'):
+        log_challonge.error('Cannot send the Challonge requests to %s: unsupported pychallonge_async version' % api_url)
+        return None
+    previous = library.CHALLONGE_API_URL
+    library.CHALLONGE_API_URL = api_url
+    log_challonge.info('Challonge requests are sent to %s' % api_url)
+    return previous
+
+
+if app_config.get('challonge_api_url'):
+    set_api_url(app_config['challonge_api_url'])
+
+
 async def get(user_id):
     user = db.get_user(user_id)
     if not user or not user.discord_id:
@@ -63,11 +122,17 @@ async def get(user_id):
             return x['account'], None
 
     newAccount = Account(user.challonge_user_name, encoder.decrypt(user.api_key))
+
+    async def validate():
+        return await newAccount.is_valid
+
     try:
-        await newAccount.is_valid
+        await breaker.call(validate, timeout=C_ChallongeTimeout)
+    except ChallongeUnavailable as e:
+        return None, e
     except ChallongeException:
         return None, InvalidCredentials()
 
-    newEntry = {'user_id': user.discord_id, 'account': newAccount}
+    newEntry = {'user_id': user.discord_id, 'account': GuardedAccount(newAccount)}
     challonge_accounts.append(newEntry)
     return newEntry['account'], None
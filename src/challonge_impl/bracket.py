@@ -0,0 +1,109 @@
+class Participant:
+    __slots__ = ('id', 'name', 'seed', 'final_rank', 'checked_in', 'matches')
+
+    def __init__(self, p):
+        self.id = p['id']
+        self.name = p['name']
+        self.seed = p.get('seed')
+        self.final_rank = p.get('final-rank')
+        self.checked_in = p.get('checked-in', False)
+        self.matches = []  # filled by Tournament, in API order
+
+    def __repr__(self):
+        return '[Participant:%s]' % self.name
+
+    def matches_in_state(self, state):
+        return [m for m in self.matches if m.state == state]
+
+
+class Match:
+    __slots__ = ('id', 'state', 'round', 'identifier',
+                 'player1_id', 'player2_id', 'player1', 'player2',
+                 'player1_prereq_id', 'player2_prereq_id',
+                 'player1_is_prereq_loser', 'player2_is_prereq_loser',
+                 'winner_id', 'loser_id', 'scores_csv',
+                 'started_at', 'updated_at', 'completed_at')
+
+    def __init__(self, m):
+        self.id = m['id']
+        self.state = m['state']
+        self.round = m['round']
+        self.identifier = m.get('identifier')
+        self.player1_id = m['player1-id']
+        self.player2_id = m['player2-id']
+        self.player1 = None  # resolved by Tournament
+        self.player2 = None
+        self.player1_prereq_id = m.get('player1-prereq-match-id')
+        self.player2_prereq_id = m.get('player2-prereq-match-id')
+        self.player1_is_prereq_loser = m.get('player1-is-prereq-match-loser', False)
+        self.player2_is_prereq_loser = m.get('player2-is-prereq-match-loser', False)
+        self.winner_id = m.get('winner-id')
+        self.loser_id = m.get('loser-id')
+        self.scores_csv = m.get('scores-csv')
+        self.started_at = m.get('started-at')
+        self.updated_at = m.get('updated-at')
+        self.completed_at = m.get('completed-at')
+
+    def __repr__(self):
+        return '[Match:%s]' % self.id
+
+    def involves(self, p_id):
+        return self.player1_id == p_id or self.player2_id == p_id
+
+    def opponent_of(self, p_id):
+        return self.player2 if self.player1_id == p_id else self.player1
+
+
+class Tournament:
+    """Typed view of a Challonge tournament payload
+
+    Built once per fetch, with participants and matches indexed by id (and
+    participants by name) so that lookups don't scan the raw lists
+    """
+    __slots__ = ('id', 'name', 'url', 'state', 'tournament_type', 'participants_count', 'updated_at',
+                 'participants', 'matches', '_participants_by_id', '_participants_by_name', '_matches_by_id')
+
+    def __init__(self, t):
+        self.id = t['id']
+        self.name = t['name']
+        self.url = t['full-challonge-url']
+        self.state = t['state']
+        self.tournament_type = t['tournament-type']
+        self.participants_count = t['participants-count']
+        self.updated_at = t.get('updated-at')
+        # freshly created / started tournaments may be returned without includes
+        self.participants = [Participant(p) for p in t.get('participants', [])]
+        self.matches = [Match(m) for m in t.get('matches', [])]
+
+        self._participants_by_id = {p.id: p for p in self.participants}
+        self._participants_by_name = {}
+        for p in self.participants:
+            self._participants_by_name.setdefault(p.name, p)
+        self._matches_by_id = {m.id: m for m in self.matches}
+
+        for m in self.matches:
+            m.player1 = self._participants_by_id.get(m.player1_id)
+            m.player2 = self._participants_by_id.get(m.player2_id)
+            if m.player1:
+                m.player1.matches.append(m)
+            if m.player2:
+                m.player2.matches.append(m)
+
+    def __repr__(self):
+        return '[Tournament:%s]' % self.name
+
+    def participant(self, p_id):
+        return self._participants_by_id.get(p_id)
+
+    def participant_named(self, name):
+        return self._participants_by_name.get(name)
+
+    def match(self, m_id):
+        return self._matches_by_id.get(m_id)
+
+    def matches_in_state(self, state):
+        return [m for m in self.matches if m.state == state]
+
+    @property
+    def is_elimination(self):
+        return self.tournament_type in ['single elimination', 'double elimination']
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from enum import Enum
+
+import aiohttp
+from challonge import ChallongeException
+
+from log import log_challonge
+
+
+class BreakerState(Enum):
+    Closed = 0
+    Open = 1
+    HalfOpen = 2
+
+
+class ChallongeUnavailable(ChallongeException):
+    def __str__(self):
+        return 'Challonge is not responding right now. Please try again in a few minutes'
+
+
+class CircuitBreaker:
+    """Fail fast while Challonge is unreachable
+
+    After `failure_threshold` consecutive timeouts / connection errors the breaker opens
+    and every request fails immediately with ChallongeUnavailable. Once `recovery_time`
+    seconds have passed a single probe request is let through: it closes the breaker
+    on success and opens it again on failure.
+    Errors reported by Challonge itself (ChallongeException) mean the service answered
+    and don't count as failures. Each call has its own timeout: requests that are slow
+    by nature (whole brackets, bulk adds) are only limited by the library's own timeout
+    """
+    def __init__(self, failure_threshold=3, recovery_time=30):
+        self._failure_threshold = failure_threshold
+        self._recovery_time = recovery_time
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return BreakerState.Closed
+        if time.time() - self._opened_at >= self._recovery_time:
+            return BreakerState.HalfOpen
+        return BreakerState.Open
+
+    def _on_success(self):
+        if self._opened_at is not None:
+            log_challonge.info('Challonge is reachable again, closing circuit breaker')
+        self._failures = 0
+        self._opened_at = None
+
+    def _on_failure(self, exc):
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self._failure_threshold:
+            log_challonge.warning('Challonge request failed (%s), circuit breaker is open for %ss' % (exc, self._recovery_time))
+            self._opened_at = time.time()
+
+    async def call(self, func, *args, timeout=None, **kwargs):
+        """timeout: seconds after which the call counts as failed, None for no limit other than the library's"""
+        state = self.state
+        if state == BreakerState.Open or (state == BreakerState.HalfOpen and self._probing):
+            raise ChallongeUnavailable()
+
+        probe = state == BreakerState.HalfOpen
+        if probe:
+            self._probing = True
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+        except (asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+            self._on_failure(e if str(e) else type(e).__name__)
+            raise ChallongeUnavailable() from e
+        except ChallongeException:
+            self._on_success()
+            raise
+        else:
+            self._on_success()
+            return result
+        finally:
+            if probe:
+                self._probing = False
+
+
+breaker = CircuitBreaker()
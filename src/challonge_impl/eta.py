@@ -0,0 +1,113 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+
+
+default_match_duration = 15 * 60  # seconds, until a match has been completed
+
+
+def _utc(value):
+    """Naive UTC datetime from the API datetimes (aware datetimes or ISO strings)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            return None
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def median_match_duration(t):
+    durations = []
+    for m in t.matches:
+        started, completed = _utc(m.started_at), _utc(m.completed_at)
+        if m.state == 'complete' and started and completed and completed > started:
+            durations.append((completed - started).total_seconds())
+    if not durations:
+        return default_match_duration
+    durations.sort()
+    middle = len(durations) // 2
+    return durations[middle] if len(durations) % 2 else (durations[middle - 1] + durations[middle]) / 2
+
+
+def estimate_match_ends(t, now=None):
+    """Estimated end of every match not complete yet, in seconds from now
+
+    Matches are walked once, prerequisites first: a match starts when the matches feeding
+    its empty slots are over and its players are done with their previous match, and lasts
+    the median duration observed so far. Open matches only have what's left of it to play
+    Returns (median duration, {match id: end})
+    """
+    now = now or datetime.utcnow()
+    duration = median_match_duration(t)
+
+    # pending matches wait on the prerequisites of their empty slots
+    waits_on = {}
+    consumers = {}
+    for m in t.matches:
+        if m.state == 'complete':
+            continue
+        waits_on[m.id] = 0
+        for seated_id, prereq_id in [(m.player1_id, m.player1_prereq_id), (m.player2_id, m.player2_prereq_id)]:
+            prereq = t.match(prereq_id) if prereq_id and not seated_id else None
+            if prereq and prereq.state != 'complete':
+                waits_on[m.id] += 1
+                consumers.setdefault(prereq.id, []).append(m.id)
+
+    def order_key(m):
+        return abs(m.round), m.round < 0, m.id
+
+    # Kahn, earliest rounds first so that players availability follows the bracket
+    heap = [(order_key(m), m.id) for m in t.matches if waits_on.get(m.id) == 0]
+    heapq.heapify(heap)
+    ends = {}
+    starts = {}
+    available = {}  # participant id -> end of their last estimated match
+    while heap:
+        _, m_id = heapq.heappop(heap)
+        m = t.match(m_id)
+        start = max([starts.get(m_id, 0)] + [available.get(p_id, 0) for p_id in [m.player1_id, m.player2_id] if p_id])
+        if m.state == 'open':
+            started = _utc(m.started_at) or now
+            end = start + max(duration - (now - started).total_seconds(), 0)
+        else:
+            end = start + duration
+        ends[m_id] = end
+        for p_id in [m.player1_id, m.player2_id]:
+            if p_id:
+                available[p_id] = end
+        for c in consumers.get(m_id, []):
+            starts[c] = max(starts.get(c, 0), end)
+            waits_on[c] -= 1
+            if waits_on[c] == 0:
+                heapq.heappush(heap, (order_key(t.match(c)), c))
+    return duration, ends
+
+
+def _format_delay(seconds):
+    minutes = int(round(seconds / 60))
+    return '%dh%02d' % divmod(minutes, 60) if minutes >= 60 else '%d min' % minutes
+
+
+def get_eta_repr(t, round=None):
+    duration, ends = estimate_match_ends(t)
+    if round is not None:
+        remaining = [end for m_id, end in ends.items() if t.match(m_id).round == round]
+        what = 'round %s' % round if round > 0 else 'losers round %s' % -round
+        if not remaining:
+            known = any(m.round == round for m in t.matches)
+            return '✅ The %s is over' % what if known else '❌ There is no %s in this tournament' % what
+    else:
+        remaining = list(ends.values())
+        what = 'the tournament'
+        if not remaining:
+            return '✅ All matches are over'
+
+    end = max(remaining)
+    eta = datetime.utcnow() + timedelta(seconds=end)
+    msg = '⏱ Estimated end of {0}: in ~{1} (around {2:%H:%M} UTC), based on a median match of {3}'.format(what, _format_delay(end), eta, _format_delay(duration))
+    if t.tournament_type == 'swiss':
+        msg += '\n⚠ Only the rounds already paired are taken into account'
+    return msg
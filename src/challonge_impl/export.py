@@ -0,0 +1,65 @@
+import csv
+import json
+
+
+fields = ['record', 'tournament_id', 'tournament', 'tournament_url', 'tournament_type', 'tournament_state',
+          'participant_id', 'name', 'seed', 'final_rank',
+          'match_id', 'round', 'identifier', 'state', 'player1', 'player2', 'scores', 'winner', 'loser', 'completed_at']
+
+
+def _date(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _name(p):
+    return p.name if p else None
+
+
+def iter_export_records(t):
+    """One record per participant then per match of the tournament, with the tournament fields repeated"""
+    tournament = {'tournament_id': t.id,
+                  'tournament': t.name,
+                  'tournament_url': t.url,
+                  'tournament_type': t.tournament_type,
+                  'tournament_state': t.state}
+    for p in t.participants:
+        record = {'record': 'participant'}
+        record.update(tournament)
+        record.update({'participant_id': p.id, 'name': p.name, 'seed': p.seed, 'final_rank': p.final_rank})
+        yield record
+    for m in t.matches:
+        record = {'record': 'match'}
+        record.update(tournament)
+        record.update({'match_id': m.id,
+                       'round': m.round,
+                       'identifier': m.identifier,
+                       'state': m.state,
+                       'player1': _name(m.player1),
+                       'player2': _name(m.player2),
+                       'scores': m.scores_csv,
+                       'winner': _name(t.participant(m.winner_id)),
+                       'loser': _name(t.participant(m.loser_id)),
+                       'completed_at': _date(m.completed_at)})
+        yield record
+
+
+class CSVExport:
+    def __init__(self, f):
+        self._writer = csv.DictWriter(f, fields)
+        self._writer.writeheader()
+
+    def write(self, t):
+        self._writer.writerows(iter_export_records(t))
+
+
+class JSONLinesExport:
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, t):
+        for record in iter_export_records(t):
+            self._f.write(json.dumps(record, ensure_ascii=False))
+            self._f.write('\n')
+
+
+export_formats = {'csv': CSVExport, 'jsonl': JSONLinesExport}
@@ -0,0 +1,240 @@
+"""Bracket images rendered from the tournament snapshot
+
+Needs Pillow, which is optional: without it no image is rendered and commands only answer with text.
+Rendering happens in a worker process, and images are cached per (tournament, version) in memory
+and on disk, so an unchanged bracket is never drawn twice, even across restarts
+"""
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+from log import log_challonge
+from const import C_BracketImagesDir, C_BracketImagesMemoryBytes, C_BracketImagesDiskBytes
+
+
+max_column_matches = 64  # bigger brackets would not be readable in a single image
+
+_box_width = 200
+_box_height = 36
+_column_gap = 32
+_row_gap = 10
+_margin = 16
+_title_height = 28
+_background = (54, 57, 63)
+_box = (47, 49, 54)
+_box_open = (64, 76, 104)
+_line = (114, 118, 125)
+_text = (220, 221, 222)
+_text_lost = (142, 146, 151)
+
+
+def _player_scores(scores_csv):
+    """'3-1,0-2' -> ('3 0', '1 2')"""
+    sets = re.findall(r'(\d+)-(\d+)', scores_csv or '')
+    return ' '.join(s[0] for s in sets), ' '.join(s[1] for s in sets)
+
+
+def bracket_layout(t):
+    """Picklable description of the bracket: (title, sections), None if there is nothing to draw
+
+    A section is a list of columns (one per round, winners bracket then losers bracket),
+    a column a list of (match id, prerequisite ids, open, player1 line, player2 line)
+    where a player line is (name, scores, lost)
+    """
+    rounds = {}
+    for m in t.matches:
+        rounds.setdefault(m.round, []).append(m)
+    if not rounds or max(len(matches) for matches in rounds.values()) > max_column_matches:
+        return None
+
+    sections = []
+    for bracket_rounds in [sorted(r for r in rounds if r > 0), sorted((r for r in rounds if r < 0), reverse=True)]:
+        columns = []
+        for r in bracket_rounds:
+            column = []
+            for m in rounds[r]:
+                p1_scores, p2_scores = _player_scores(m.scores_csv)
+                column.append((m.id,
+                               (m.player1_prereq_id, m.player2_prereq_id),
+                               m.state == 'open',
+                               (m.player1.name if m.player1 else '', p1_scores, m.state == 'complete' and m.loser_id == m.player1_id),
+                               (m.player2.name if m.player2 else '', p2_scores, m.state == 'complete' and m.loser_id == m.player2_id)))
+            columns.append(column)
+        if columns:
+            sections.append(columns)
+    return t.name, sections
+
+
+def render_bracket(layout):
+    """PNG bytes of a bracket layout. Runs in the worker process"""
+    title, sections = layout
+    font = ImageFont.load_default()
+    column_count = max(len(columns) for columns in sections)
+    heights = [max(len(column) for column in columns) * (_box_height + _row_gap) for columns in sections]
+    width = 2 * _margin + column_count * (_box_width + _column_gap) - _column_gap
+    height = 2 * _margin + _title_height + sum(heights) + _margin * (len(sections) - 1)
+
+    image = Image.new('RGB', (width, height), _background)
+    draw = ImageDraw.Draw(image)
+    draw.text((_margin, _margin), title, fill=_text, font=font)
+
+    top = _margin + _title_height
+    for columns, section_height in zip(sections, heights):
+        anchors = {}  # match id -> right middle of its box
+        for c, column in enumerate(columns):
+            x = _margin + c * (_box_width + _column_gap)
+            slot = section_height / len(column)
+            for i, (m_id, prereq_ids, is_open, player1, player2) in enumerate(column):
+                y = int(top + (i + 0.5) * slot - _box_height / 2)
+                draw.rectangle([x, y, x + _box_width, y + _box_height], fill=_box_open if is_open else _box, outline=_line)
+                draw.line([x, y + _box_height // 2, x + _box_width, y + _box_height // 2], fill=_line)
+                for line, (name, scores, lost) in enumerate([player1, player2]):
+                    text_y = y + 3 + line * _box_height // 2
+                    color = _text_lost if lost else _text
+                    draw.text((x + 6, text_y), name[:24], fill=color, font=font)
+                    if scores:
+                        draw.text((x + _box_width - 6 - 6 * len(scores), text_y), scores, fill=color, font=font)
+                for prereq_id in prereq_ids:
+                    if prereq_id in anchors:
+                        px, py = anchors[prereq_id]
+                        middle = x - _column_gap // 2
+                        draw.line([px, py, middle, py, middle, y + _box_height // 2, x, y + _box_height // 2], fill=_line)
+                anchors[m_id] = (x + _box_width, y + _box_height // 2)
+        top += section_height + _margin
+
+    output = BytesIO()
+    image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+class BracketImageCache:
+    """PNG of every (tournament, version) rendered so far
+
+    The most recent images are kept in memory, all of them on disk, both bounded in size
+    (least recently used evicted first). Older versions of a tournament are dropped as soon
+    as a newer one is rendered. Concurrent requests for the same image share a single render
+    """
+    def __init__(self, directory, memory_bytes, disk_bytes):
+        self._directory = directory
+        self._memory_bytes = memory_bytes
+        self._disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # (t_id as str, version) -> png
+        self._memory_size = 0
+        self._rendering = {}  # (t_id, version) -> future
+        self._executor = None
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    def _path(self, t_id, version):
+        return os.path.join(self._directory, '%s-%s.png' % (t_id, version))
+
+    def _remember(self, key, png):
+        self._memory[key] = png
+        self._memory_size += len(png)
+        while self._memory_size > self._memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _forget(self, t_id, keep_version=None):
+        for key in [k for k in self._memory if k[0] == t_id and k[1] != keep_version]:
+            self._memory_size -= len(self._memory.pop(key))
+        try:
+            files = os.listdir(self._directory)
+        except OSError:
+            return
+        prefix = '%s-' % t_id
+        for f in files:
+            if f.startswith(prefix) and f != os.path.basename(self._path(t_id, keep_version)):
+                try:
+                    os.remove(os.path.join(self._directory, f))
+                except OSError:
+                    pass
+
+    def _read(self, key):
+        path = self._path(*key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+            os.utime(path)  # recently used
+        except OSError:
+            return None
+        return png
+
+    def _write(self, key, png):
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(self._path(*key), 'wb') as f:
+                f.write(png)
+            files = [os.path.join(self._directory, f) for f in os.listdir(self._directory)]
+            files = sorted(((os.stat(f), f) for f in files), key=lambda x: x[0].st_mtime)
+            total = sum(stat.st_size for stat, _ in files)
+            for stat, f in files[:-1]:
+                if total <= self._disk_bytes:
+                    break
+                os.remove(f)
+                total -= stat.st_size
+        except OSError:
+            log_challonge.exception('Could not store bracket image %s' % (key,))
+
+    async def _render(self, t):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        layout = bracket_layout(t)
+        if layout is None:
+            return None
+        try:
+            return await asyncio.get_event_loop().run_in_executor(self._executor, render_bracket, layout)
+        except BrokenProcessPool:
+            log_challonge.exception('Bracket image worker died')
+            self._executor = None
+        except Exception:
+            log_challonge.exception('Could not render bracket image of tournament %s' % t.id)
+        return None
+
+    async def get(self, t, version):
+        """PNG bytes of that version of the tournament bracket, None if it can't be rendered"""
+        if not self.enabled:
+            return None
+        if not version:  # unknown version: can't be cached
+            return await self._render(t)
+
+        t_id = str(t.id)  # as stored in the database, which is what prune gets
+        key = (t_id, version)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        png = self._read(key)
+        if png is not None:
+            self._remember(key, png)
+            return png
+        if key in self._rendering:
+            return await asyncio.shield(self._rendering[key])
+
+        future = asyncio.ensure_future(self._render(t))
+        self._rendering[key] = future
+        try:
+            png = await asyncio.shield(future)
+        finally:
+            self._rendering.pop(key, None)
+        if png is not None:
+            self._forget(t_id, keep_version=version)
+            self._write(key, png)
+            self._remember(key, png)
+        return png
+
+    def prune(self, t_id):
+        self._forget(str(t_id))
+
+
+bracket_images = BracketImageCache(C_BracketImagesDir, C_BracketImagesMemoryBytes, C_BracketImagesDiskBytes)
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import deque, OrderedDict
+
+from challonge import ChallongeException
+
+from database.core import db
+from modules.core import modules
+from log import log_challonge
+from challonge_impl.accounts import get as get_account
+from challonge_impl.events import Events
+from challonge_impl.snapshot import snapshots, TournamentSnapshot
+from challonge_impl.utils import TournamentState
+
+
+def diff_events(previous, current):
+    """Events between two payloads of the same tournament, as (event, event_args) tuples"""
+    events = []
+    t_name = current['name']
+
+    prev_participants = {p['id']: p for p in previous.get('participants', [])}
+    cur_participants = {p['id']: p for p in current.get('participants', [])}
+    for p_id, p in cur_participants.items():
+        prev_p = prev_participants.get(p_id)
+        if not prev_p:
+            events.append((Events.on_join, {'p1_name': p['name'], 't_name': t_name}))
+        else:
+            if prev_p.get('active', True) and not p.get('active', True):
+                events.append((Events.on_forfeit, {'p1_name': p['name'], 't_name': t_name}))
+            if not prev_p.get('checked-in') and p.get('checked-in'):
+                events.append((Events.on_player_checkin, {'p1_name': p['name'], 't_name': t_name}))
+    for p_id, p in prev_participants.items():
+        if p_id not in cur_participants:
+            events.append((Events.on_forfeit, {'p1_name': p['name'], 't_name': t_name}))
+
+    if not previous.get('started-checking-in-at') and current.get('started-checking-in-at'):
+        events.append((Events.on_checkin_start, {'t_name': t_name}))
+
+    prev_matches = {m['id']: m for m in previous.get('matches', [])}
+    for m in current.get('matches', []):
+        prev_m = prev_matches.get(m['id'])
+        if m['state'] == 'complete' and (not prev_m or prev_m['state'] != 'complete'):
+            p1 = cur_participants.get(m['player1-id'])
+            p2 = cur_participants.get(m['player2-id'])
+            if p1 and p2:
+                events.append((Events.on_update_score, {'p1_name': p1['name'], 'score': m.get('scores-csv'), 'p2_name': p2['name']}))
+
+    return events
+
+
+def apply_changes(handled, previous, current):
+    """The handled payload, updated with whatever differs between previous and current"""
+    if handled is None or previous is None:
+        return current
+    result = dict(handled)
+    for key, value in current.items():
+        if key not in ['participants', 'matches'] and previous.get(key) != value:
+            result[key] = value
+    for key in ['participants', 'matches']:
+        prev_items = {x['id']: x for x in previous.get(key, [])}
+        cur_items = {x['id']: x for x in current.get(key, [])}
+        items = OrderedDict((x['id'], x) for x in handled.get(key, []))
+        for x_id, x in cur_items.items():
+            if prev_items.get(x_id) != x:
+                items[x_id] = x
+        for x_id in prev_items:
+            if x_id not in cur_items:
+                items.pop(x_id, None)
+        result[key] = list(items.values())
+    return result
+
+
+class TournamentPoller:
+    """Picks up changes made outside of the bot (on the Challonge website...)
+
+    Every active tournament is refreshed at its own pace: fast while it is underway and
+    changing, backing off while nothing happens, slowly while pending. Differences with
+    the last payload the poller handled are dispatched to the modules as if they came from a command.
+    Changes made by commands, which dispatch their own events, are applied to that payload
+    so that they are not dispatched twice. Any other change is, even if a command read it first
+    """
+    tick = 5
+    fast_interval = 30
+    slow_interval = 240
+    idle_interval = 600
+    max_calls_per_minute = 20
+
+    def __init__(self):
+        self._client = None
+        self._intervals = {}  # t_id -> current interval
+        self._next_poll = {}  # t_id -> timestamp
+        self._handled = {}  # t_id -> last payload whose events were dispatched
+        self._calls = deque()
+
+    def start(self, client):
+        if self._client is None:
+            self._client = client
+            client.loop.create_task(self._run())
+
+    def _acquire_call(self):
+        now = time.time()
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+        if len(self._calls) >= TournamentPoller.max_calls_per_minute:
+            return False
+        self._calls.append(now)
+        return True
+
+    def _schedule(self, t_id, state, changed):
+        if state == 'underway':
+            if changed:
+                interval = TournamentPoller.fast_interval
+            else:
+                interval = min(self._intervals.get(t_id, TournamentPoller.fast_interval) * 2, TournamentPoller.slow_interval)
+        else:
+            interval = TournamentPoller.idle_interval
+        self._intervals[t_id] = interval
+        self._next_poll[t_id] = time.time() + interval
+
+    async def _run(self):
+        while not self._client.is_closed:
+            try:
+                await self._poll_due()
+            except Exception:
+                log_challonge.exception('TournamentPoller')
+            await asyncio.sleep(TournamentPoller.tick)
+
+    async def _poll_due(self):
+        now = time.time()
+        for server in list(self._client.servers):
+            for db_t in list(db.get_tournaments(server.id)):
+                if self._next_poll.get(db_t.challonge_id, 0) > now:
+                    continue
+                if not self._acquire_call():
+                    return  # budget spent for this minute
+                await self._poll(server, db_t)
+
+    async def _poll(self, server, db_t):
+        t_id = db_t.challonge_id
+        own_changes = snapshots.pop_own_changes(t_id)
+        previous = self._handled.get(t_id)
+        if previous is None:
+            previous, _ = snapshots.get(t_id)  # first poll: the last known payload, persisted across restarts
+        else:
+            for before, after in own_changes:
+                previous = apply_changes(previous, before, after)
+        self._handled[t_id] = previous
+        if previous and previous['state'] == 'complete':
+            self._next_poll[t_id] = float('inf')
+            return
+
+        account, exc = await get_account(db_t.host_id)
+        if exc:
+            log_challonge.info('TournamentPoller skipping %s: %s' % (t_id, exc))
+            self._schedule(t_id, None, False)
+            return
+
+        snapshot = TournamentSnapshot(account, t_id)
+        try:
+            await snapshot.get()
+        except ChallongeException as e:
+            log_challonge.info('TournamentPoller failed to refresh %s: %s' % (t_id, e))
+            self._schedule(t_id, previous['state'] if previous else None, False)
+            return
+
+        current = snapshot.raw
+        self._handled[t_id] = current
+        changed = previous is not None and previous != current
+        self._schedule(t_id, current['state'], changed)
+        if not changed:
+            return
+
+        for event, event_args in diff_events(previous, current):
+            await modules.on_event(server.id, event, me=server.me, **event_args)
+        if previous['state'] != current['state'] and current['state'] in TournamentState.__members__.keys():
+            await modules.on_state_change(server.id, TournamentState[current['state']], t_name=current['name'], me=server.me)
+
+        # imported here: commands depend on challonge_impl, not the other way around
+        from commands.definitions.challonge import update_channel_topic
+        channel = server.get_channel(db_t.channel_id)
+        if channel:
+            await update_channel_topic(await snapshot.get(), self._client, channel)
+
+
+poller = TournamentPoller()
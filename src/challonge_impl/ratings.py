@@ -0,0 +1,40 @@
+from database.core import db
+from log import log_challonge
+
+
+default_rating = 1500
+k_factor = 32
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def record_tournament_results(t, server_id):
+    """Adds the matches of a finalized tournament to the server history and updates the Elo rating of its players
+
+    Only the ratings of this tournament's players are read and written: the history is never replayed.
+    Participants not mapped to a Discord member are left out. Returns the number of matches recorded
+    """
+    if db.has_match_history(str(t.id)):
+        return 0  # already recorded
+
+    users = {int(u.participant_id): u.discord_id for u in db.get_tournament_users(str(t.id)) if u.participant_id is not None}
+    matches = [m for m in t.matches if m.state == 'complete' and m.winner_id in users and m.loser_id in users]
+    matches.sort(key=lambda m: (str(m.completed_at), m.id))
+
+    current = {x.discord_id: (float(x.rating), int(x.matches)) for x in db.get_ratings(server_id, set(users.values())).values()}
+    history = []
+    for m in matches:
+        winner, loser = users[m.winner_id], users[m.loser_id]
+        winner_rating, winner_count = current.get(winner, (default_rating, 0))
+        loser_rating, loser_count = current.get(loser, (default_rating, 0))
+        delta = k_factor * (1 - expected_score(winner_rating, loser_rating))
+        current[winner] = (winner_rating + delta, winner_count + 1)
+        current[loser] = (loser_rating - delta, loser_count + 1)
+        history.append((m.id, winner, loser, m.scores_csv, str(m.completed_at) if m.completed_at else None))
+
+    involved = set([x[1] for x in history] + [x[2] for x in history])
+    db.add_tournament_results(server_id, str(t.id), history, {d_id: current[d_id] for d_id in involved})
+    log_challonge.info('Recorded %d matches of tournament %s for server %s' % (len(history), t.id, server_id))
+    return len(history)
@@ -0,0 +1,72 @@
+import itertools
+
+import discord
+
+from log import log_challonge
+from discord_impl.client import Priority
+from utils import Debouncer, paginate_lines
+from challonge_impl.utils import iter_status_lines
+from const import C_MessageMaxLength, T_Scoreboard
+
+
+def get_scoreboard_repr(t):
+    """Content of the scoreboard: the tournament status, cut to a single message"""
+    pages = paginate_lines(itertools.chain([T_Scoreboard], iter_status_lines(t)), C_MessageMaxLength - 64)
+    content = next(pages)
+    if next(pages, None) is not None:
+        content += '\n           ... (see `status` for everything)'
+    return content
+
+
+class Scoreboards:
+    """One pinned message per tournament channel, edited in place
+
+    Updates of a channel are coalesced: a burst of reports ends up in a single edit, made with the
+    latest tournament data, and only when the rendered content differs from the message.
+    The message is found again in the channel pins after a restart
+    """
+    delay = 3  # seconds
+
+    def __init__(self):
+        self._messages = {}  # channel id -> message
+        self._debouncer = Debouncer(Scoreboards.delay)
+
+    def update(self, client, channel, t):
+        if t.state == 'pending':
+            return  # nothing to show before the first match
+        self._debouncer.schedule(channel.id, self._apply, client, channel, t)
+
+    def forget(self, channel_id):
+        self._debouncer.cancel(channel_id)
+        self._messages.pop(channel_id, None)
+
+    async def _find(self, client, channel):
+        for m in await client.pins_from(channel):
+            if m.author.id == client.user.id and m.content.startswith(T_Scoreboard):
+                return m
+        return None
+
+    async def _apply(self, client, channel, t):
+        content = get_scoreboard_repr(t)
+        message = self._messages.get(channel.id)
+        if message is None:
+            message = await self._find(client, channel)
+        if message is not None and message.content == content:
+            self._messages[channel.id] = message
+            return
+
+        if message is not None:
+            try:
+                message = await client.edit_message(message, content, priority=Priority.Notice)
+            except discord.errors.NotFound:  # unpinned and deleted
+                message = None
+        if message is None:
+            message = await client.send_message(channel, content, priority=Priority.Notice, merge=False)
+            try:
+                await client.pin_message(message, priority=Priority.Notice)
+            except discord.errors.HTTPException:
+                log_challonge.info('Could not pin the scoreboard in %s' % channel.id)
+        self._messages[channel.id] = message
+
+
+scoreboards = Scoreboards()
@@ -0,0 +1,206 @@
+import json
+import zlib
+from datetime import datetime
+
+from database.core import db
+from challonge_impl.bracket import Tournament
+from challonge_impl.breaker import ChallongeUnavailable
+from log import log_challonge
+
+
+_datetime_format = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.strftime(_datetime_format + '%z')}  # ISO 8601, with an offset if aware
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        text = obj['__datetime__']
+        return datetime.strptime(text, _datetime_format + ('%z' if text[-5] in '+-' else ''))
+    return obj
+
+
+def _dumps(raw):
+    """Compressed JSON of a tournament payload"""
+    return zlib.compress(json.dumps(raw, default=_encode_value).encode('utf-8'))
+
+
+def _loads(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'), object_hook=_decode_object)
+
+
+class SnapshotStore:
+    """Last known payload of every tournament fetched by the bot
+
+    Entries are kept in memory and persisted (JSON + zlib) in the database whenever
+    the tournament changed, so that a restarted bot can lazily pick them up again
+    instead of re-fetching everything from Challonge.
+    Changes made by the bot itself are also recorded until the poller picks them up
+    """
+    date_format = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self):
+        self._entries = {}  # t_id -> (raw, fetched_at, version)
+        self._models = {}  # t_id -> (version, Tournament)
+        self._loaded = set()
+        self._own_changes = {}  # t_id -> [(previous raw, raw)]
+
+    def _load(self, t_id):
+        self._loaded.add(t_id)
+        db_snapshot = db.get_snapshot(t_id)
+        if db_snapshot.data is not None:
+            try:
+                raw = _loads(bytes(db_snapshot.data))
+            except (zlib.error, ValueError):
+                log_challonge.exception('Discarding unreadable snapshot of tournament %s' % t_id)
+                db.remove_snapshot(t_id)
+            else:
+                fetched_at = datetime.strptime(db_snapshot.fetched_at, SnapshotStore.date_format)
+                self._entries[t_id] = (raw, fetched_at, int(db_snapshot.version))
+
+    def put(self, t_id, raw, own_change=False):
+        """own_change: the payload was fetched after a change made by the bot (whose events it dispatched)"""
+        previous, _, version = self.get_versioned(t_id)
+        if own_change:
+            self._own_changes.setdefault(t_id, []).append((previous, raw))
+        fetched_at = datetime.utcnow().replace(microsecond=0)
+        if previous != raw:
+            version += 1
+            if raw['state'] == 'complete':
+                # finalized tournaments won't change anymore: no need to survive a restart
+                db.remove_snapshot(t_id)
+            else:
+                db.set_snapshot(t_id, version, fetched_at.strftime(SnapshotStore.date_format), _dumps(raw))
+        self._entries[t_id] = (raw, fetched_at, version)
+        return version
+
+    def get_versioned(self, t_id):
+        """Returns (raw, fetched_at, version) or (None, None, 0), loading the persisted snapshot on first access"""
+        if t_id not in self._loaded:
+            self._load(t_id)
+        return self._entries.get(t_id, (None, None, 0))
+
+    def get(self, t_id):
+        """Returns (raw, fetched_at) or (None, None)"""
+        raw, fetched_at, _ = self.get_versioned(t_id)
+        return raw, fetched_at
+
+    def pop_own_changes(self, t_id):
+        """(previous raw, raw) of every change made by the bot since the last call"""
+        return self._own_changes.pop(t_id, [])
+
+    def model(self, t_id, raw, version):
+        """Tournament model of that version of the payload, built once"""
+        model_version, t = self._models.get(t_id, (None, None))
+        if model_version != version or version == 0:
+            t = Tournament(raw)
+            if version:
+                self._models[t_id] = (version, t)
+        return t
+
+    def prune(self, t_id):
+        self._entries.pop(t_id, None)
+        self._models.pop(t_id, None)
+        self._own_changes.pop(t_id, None)
+        self._loaded.add(t_id)
+        db.remove_snapshot(t_id)
+
+
+snapshots = SnapshotStore()
+
+
+class RenderCache:
+    """Text rendered by read-only commands, per tournament version
+
+    All the entries of a tournament are dropped as soon as its version changes, so
+    a cached text is always the one the snapshot at hand would render
+    """
+    def __init__(self):
+        self._entries = {}  # t_id -> (version, {key: text})
+
+    def get_or_render(self, snapshot, key, render):
+        version, rendered = self._entries.get(snapshot.tournament_id, (None, None))
+        if version != snapshot.version or not version:
+            rendered = {}
+            self._entries[snapshot.tournament_id] = (snapshot.version, rendered)
+        if key not in rendered:
+            rendered[key] = render()
+        return rendered[key]
+
+    def prune(self, t_id):
+        self._entries.pop(t_id, None)
+
+
+renders = RenderCache()
+
+
+class TournamentSnapshot:
+    """Tournament data shared by everything a single command invocation does
+
+    The tournament is fetched at most once, with participants and matches included,
+    so that state validation, helpers and the command body all read the same data.
+    Read-only commands are answered from the stored snapshot when it is recent enough
+    """
+    recent_age = 20  # seconds
+
+    def __init__(self, account, t_id):
+        self._account = account
+        self._t_id = t_id
+        self._raw = None
+        self._t = None
+        self._as_of = None
+        self._version = 0
+
+    @property
+    def tournament_id(self):
+        return self._t_id
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def version(self):
+        """Version of the data in the snapshot store, 0 if it is not known"""
+        return self._version
+
+    @property
+    def as_of(self):
+        """Fetch time of the data if it is the last known snapshot served while Challonge is unavailable, None otherwise"""
+        return self._as_of
+
+    async def get(self, read_only=False):
+        if self._t is None:
+            raw, fetched_at, version = snapshots.get_versioned(self._t_id)
+            if read_only and raw is not None and (datetime.utcnow() - fetched_at).total_seconds() < TournamentSnapshot.recent_age:
+                self._raw, self._version = raw, version
+            else:
+                try:
+                    self._raw = await self._account.tournaments.show(self._t_id, include_participants=1, include_matches=1)  # can raise
+                except ChallongeUnavailable:
+                    if not read_only or raw is None:
+                        raise
+                    log_challonge.info('Serving tournament %s as of %s' % (self._t_id, fetched_at))
+                    self._raw, self._as_of, self._version = raw, fetched_at, version
+                else:
+                    self._version = snapshots.put(self._t_id, self._raw)
+            self._t = snapshots.model(self._t_id, self._raw, self._version)
+        return self._t
+
+    def invalidate(self):
+        self._raw = None
+        self._t = None
+        self._as_of = None
+        self._version = 0
+
+    async def refresh(self):
+        """Fetches the tournament again, after a change made by the bot"""
+        self.invalidate()
+        self._raw = await self._account.tournaments.show(self._t_id, include_participants=1, include_matches=1)  # can raise
+        self._version = snapshots.put(self._t_id, self._raw, own_change=True)
+        self._t = snapshots.model(self._t_id, self._raw, self._version)
+        return self._t
@@ -0,0 +1,93 @@
+import re
+from array import array
+
+
+class StandingsRow:
+    __slots__ = ('rank', 'participant', 'wins', 'losses', 'ties', 'set_diff', 'buchholz')
+
+    def __init__(self, rank, participant, wins, losses, ties, set_diff, buchholz):
+        self.rank = rank
+        self.participant = participant
+        self.wins = wins
+        self.losses = losses
+        self.ties = ties
+        self.set_diff = set_diff
+        self.buchholz = buchholz
+
+
+def _sets(scores_csv):
+    """Sets won by player 1 and player 2"""
+    p1_sets = p2_sets = 0
+    for p1_score, p2_score in re.findall(r'(\d+)-(\d+)', scores_csv or ''):
+        if int(p1_score) > int(p2_score):
+            p1_sets += 1
+        elif int(p2_score) > int(p1_score):
+            p2_sets += 1
+    return p1_sets, p2_sets
+
+
+def compute_standings(t):
+    """Live standings of a round robin / swiss tournament, from its completed matches
+
+    Ranked by match points (win 2, tie 1), set differential, head-to-head points among
+    the players tied so far, then Buchholz (sum of the opponents' match points).
+    Players tied on every criteria share the same rank
+    """
+    index = {p.id: i for i, p in enumerate(t.participants)}
+    count = len(t.participants)
+    wins = array('i', [0]) * count
+    losses = array('i', [0]) * count
+    ties = array('i', [0]) * count
+    set_diff = array('i', [0]) * count
+
+    played = []  # (p1 index, p2 index, p1 points) of every completed match
+    for m in t.matches:
+        if m.state != 'complete' or m.player1_id not in index or m.player2_id not in index:
+            continue
+        p1, p2 = index[m.player1_id], index[m.player2_id]
+        p1_sets, p2_sets = _sets(m.scores_csv)
+        set_diff[p1] += p1_sets - p2_sets
+        set_diff[p2] += p2_sets - p1_sets
+        if m.winner_id == m.player1_id:
+            wins[p1] += 1
+            losses[p2] += 1
+            played.append((p1, p2, 2))
+        elif m.winner_id == m.player2_id:
+            wins[p2] += 1
+            losses[p1] += 1
+            played.append((p1, p2, 0))
+        else:
+            ties[p1] += 1
+            ties[p2] += 1
+            played.append((p1, p2, 1))
+
+    points = array('i', [2 * w + x for w, x in zip(wins, ties)])
+    buchholz = array('i', [0]) * count
+    head_to_head = array('i', [0]) * count
+    for p1, p2, p1_points in played:
+        buchholz[p1] += points[p2]
+        buchholz[p2] += points[p1]
+        if points[p1] == points[p2] and set_diff[p1] == set_diff[p2]:
+            head_to_head[p1] += p1_points
+            head_to_head[p2] += 2 - p1_points
+
+    keys = [(-points[i], -set_diff[i], -head_to_head[i], -buchholz[i]) for i in range(count)]
+    rows = []
+    previous_key = None
+    for position, i in enumerate(sorted(range(count), key=lambda i: (keys[i], t.participants[i].seed or 0))):
+        rank = rows[-1].rank if keys[i] == previous_key else position + 1
+        rows.append(StandingsRow(rank, t.participants[i], wins[i], losses[i], ties[i], set_diff[i], buchholz[i]))
+        previous_key = keys[i]
+    return rows
+
+
+def get_standings_repr(t, limit=16):
+    rows = compute_standings(t)
+    lines = ['Standings:']
+    for row in rows[:limit]:
+        record = '{0}-{1}'.format(row.wins, row.losses) + ('-{0}'.format(row.ties) if row.ties else '')
+        lines.append('  #{0:<4} {1:20} {2:>8} ({3:+d}) Bh {4}'.format(row.rank, '`' + row.participant.name + '`', record, row.set_diff, row.buchholz))
+    if len(rows) > limit:
+        lines.append('  ... and %d more' % (len(rows) - limit))
+    return '\n'.join(lines)
+
@@ -3,6 +3,8 @@ import math
 from challonge import ChallongeException
 
 from challonge_impl.accounts import TournamentStateConstraint
+from challonge_impl.standings import get_standings_repr
+from database.core import db
 from utils import AutoEnum
 from log import log_challonge
 
@@ -41,12 +43,12 @@ def verify_score_format(csv_score):
     return result.match(csv_score)
 
 
-def match_sort_by_round(list_):
-    return list_['round'] < 0, abs(list_['round'])
+def match_sort_by_round(m):
+    return m.round < 0, abs(m.round)
 
 
-def player_sort_by_rank(list_):
-    return list_['final-rank']
+def player_sort_by_rank(p):
+    return p.final_rank
 
 
 def get_date(date):
@@ -63,47 +65,48 @@ def get_time(time):
     return None
 
 
-async def get_participant(account, t_id, name):
-    try:
-        participants = await account.participants.index(t_id)
-    except ChallongeException as e:
-        return None, T_OnChallongeException.format(e)
-    else:
-        for x in participants:
-            if x['name'] == name:
-                return x, None
-    return None, None
+def get_player(t, name):
+    participant = t.participant_named(name)
+    return participant.id if participant else None
 
 
-async def get_players(account, t_id, p1_name, p2_name):
-    try:
-        participants = await account.participants.index(t_id)
-    except ChallongeException as e:
-        return None, None, T_OnChallongeException.format(e)
-    else:
-        p1_id = None
-        p2_id = None
-        for x in participants:
-            if x['name'] == p1_name:
-                p1_id = x['id']
-            elif x['name'] == p2_name:
-                p2_id = x['id']
-            if p1_id and p2_id:
-                break
-        return p1_id, p2_id, None
-
-
-async def get_match(account, t_id, p1_id, p2_id):
-    try:
-        openMatches = await account.matches.index(t_id, state='open', participant_id=p1_id)
-    except ChallongeException as e:
-        return None, None, T_OnChallongeException.format(e)
-    else:
-        for m in openMatches:
-            if m['player1-id'] == p1_id and m['player2-id'] == p2_id or m['player2-id'] == p1_id and m['player1-id'] == p2_id:
-                is_reversed = m['player1-id'] == p2_id
-                return m, is_reversed, None
-    return None, None, None
+def get_member_participant(t, member, remember=True):
+    """Participant registered by this Discord member
+    Members not mapped yet are matched by name, unless another member is mapped to that participant.
+    remember: store the match found by name (commands that only read the tournament don't)
+    """
+    participant = t.participant(db.get_participant_id(str(t.id), member.id))
+    if not participant:
+        participant = t.participant_named(member.name)
+        if participant and db.get_participant_discord_id(str(t.id), participant.id) not in [None, member.id]:
+            return None
+        if participant and remember:
+            db.add_tournament_user(str(t.id), member.id, participant.id)
+    return participant
+
+
+def backfill_tournament_users(t, server):
+    """Map every participant not mapped yet to the server member with the same name, if that member isn't mapped yet"""
+    tournament_users = db.get_tournament_users(str(t.id))
+    mapped = set([int(x.participant_id) for x in tournament_users if x.participant_id is not None])
+    mapped_members = set([x.discord_id for x in tournament_users])
+    users = []
+    for p in t.participants:
+        if p.id not in mapped:
+            member = server.get_member_named(p.name)
+            if member and member.id not in mapped_members:
+                users.append((member.id, p.id))
+                mapped_members.add(member.id)
+    db.add_tournament_users(str(t.id), users)
+
+
+def get_match(t, p1_id, p2_id):
+    p1 = t.participant(p1_id)
+    if p1:
+        for m in p1.matches_in_state('open'):
+            if m.involves(p2_id):
+                return m, m.player1_id == p2_id
+    return None, None
 
 
 async def update_score(account, t_id, m_id, score, winner_id):
@@ -114,321 +117,236 @@ async def update_score(account, t_id, m_id, score, winner_id):
     return '✅ These results have been uploaded to Challonge', None
 
 
-async def get_participants(account, t):
-    if 'participants' in t:
-        participants = t['participants']
-    else:
-        try:
-            participants = await account.participants.index(t['id'])
-        except ChallongeException as e:
-            return None, T_OnChallongeException.format(e)
-
-    return participants, None
-
-
-async def get_matches(account, t, state):
-    if 'matches' in t:
-        matches = [m for m in t['matches'] if m['state'] == state]
-    else:
-        try:
-            matches = await account.matches.index(t['id'], state=state)
-        except ChallongeException as e:
-            return None, T_OnChallongeException.format(e)
-
-    return matches, None
-
-
-async def _get_channel_desc_pending(account, t):
+def _get_channel_desc_pending(t):
     desc = []
-    desc.append('Tournament {0} ({1}) is pending with {2} participants'.format(t['name'], t['full-challonge-url'], t['participants-count']))
-    if t['participants-count'] < 30:
-        participants, exc = await get_participants(account, t)
-        if exc:
-            return None, exc
-
+    desc.append('Tournament {0} ({1}) is pending with {2} participants'.format(t.name, t.url, t.participants_count))
+    if t.participants_count < 30:
         desc.append('Registered participants:')
-        participantsCount = len(participants)
+        participantsCount = len(t.participants)
         cols = 4
         rows = math.ceil(participantsCount / cols)
-        participantsaArr = [[participants[x + y * cols]['name'] for x in range(cols) if x + y * cols < participantsCount] for y in range(rows)]
+        participantsaArr = [[t.participants[x + y * cols].name for x in range(cols) if x + y * cols < participantsCount] for y in range(rows)]
         desc.append('\n'.join([' '.join(participantsaArr[y]) for y in range(rows)]))
 
-    return '\n'.join(desc), None
+    return '\n'.join(desc)
 
 
-async def _get_channel_desc_underway(account, t):
-    matchesrepr, exc = await get_current_matches_repr(account, t)
-    if exc:
-        return None, exc
+def _get_channel_desc_underway(t):
+    return 'Tournament {0} ({1}) is in progress with {2} participants\nOpen matches:\n{3}'.format(t.name, t.url, t.participants_count, get_current_matches_repr(t))
 
-    toReturn = 'Tournament {0} ({1}) is in progress with {2} participants\nOpen matches:\n{3}'.format(t['name'], t['full-challonge-url'], t['participants-count'], matchesrepr)
-    return toReturn, None
 
+def _get_channel_desc_awaiting_review(t):
+    return 'Tournament is awaiting review from organizers'
 
-async def _get_channel_desc_awaiting_review(account, t):
-    return 'Tournament is awaiting review from organizers', None
 
+def _get_channel_desc_complete(t):
+    return 'Tournament is finished!\n' + get_final_ranking_repr(t)
 
-async def _get_channel_desc_complete(account, t):
-    rankingRepr, exc = get_final_ranking_repr(account, t)
-    if exc:
-        return None, exc
 
-    return 'Tournament is finished!\n' + rankingRepr, None
+def get_channel_desc(t):
+    if t.state == 'pending':
+        return _get_channel_desc_pending(t)
+    if t.state == 'underway':
+        return _get_channel_desc_underway(t)
+    if t.state == 'awaiting_review':
+        return _get_channel_desc_awaiting_review(t)
+    if t.state == 'complete':
+        return _get_channel_desc_complete(t)
 
+    log_challonge.error('[get_channel_desc] Unreferenced tournament state: ' + t.state)
+    return None
 
-async def get_channel_desc(account, t):
-    if t['state'] == 'pending':
-        return await _get_channel_desc_pending(account, t)
-    if t['state'] == 'underway':
-        return await _get_channel_desc_underway(account, t)
-    if t['state'] == 'awaiting_review':
-        return await _get_channel_desc_awaiting_review(account, t)
-    if t['state'] == 'complete':
-        return await _get_channel_desc_complete(account, t)
 
-    log_challonge.error('[get_channel_desc] Unreferenced tournament state: ' + t['state'])
-    return None, None
+def iter_status_lines(t):
+    """Lines of the tournament status, generated from the snapshot as they are consumed"""
+    if t.state == 'underway':
+        yield '✅ Open matches for tournament `{0}` ({1})'.format(t.name, t.url)
+        yield from iter_current_matches_lines(t)
+        if t.tournament_type in ['round robin', 'swiss']:
+            # final ranks are only known at completion: compute them from the results so far
+            yield from get_standings_repr(t).splitlines()
+    elif t.state == 'pending':
+        yield '✅ Tournament: {0} ({1}) is pending.'.format(t.name, t.url)
+        yield '%d participants have registered right now. More can still join until tournament is started' % t.participants_count
+    elif t.state == 'awaiting_review':
+        yield '✅ Tournament: {0} ({1}) has been completed and is waiting for final review (finalize)'.format(t.name, t.url)
+    elif t.state == 'complete':
+        yield '✅ Tournament: {0} ({1}) has been completed'.format(t.name, t.url)
+        yield from iter_final_ranking_lines(t)
+    else:
+        log_challonge.error('[iter_status_lines] Unknown state: ' + t.state)
 
 
-async def validate_tournament_state(account, t_id, constraint):
-    try:
-        t = await account.tournaments.show(t_id)
-    except ChallongeException as e:
-        raise e
+async def validate_tournament_state(snapshot, constraint, read_only=False):
+    t = await snapshot.get(read_only)  # can raise
 
-    if t['state'] == 'pending' and constraint & TournamentStateConstraint.Pending:
+    if t.state == 'pending' and constraint & TournamentStateConstraint.Pending:
         return True
-    if t['state'] == 'underway' and constraint & TournamentStateConstraint.Underway:
+    if t.state == 'underway' and constraint & TournamentStateConstraint.Underway:
         return True
-    if t['state'] == 'awaiting_review' and constraint & TournamentStateConstraint.AwaitingReview:
+    if t.state == 'awaiting_review' and constraint & TournamentStateConstraint.AwaitingReview:
         return True
-    if t['state'] == 'complete' and constraint & TournamentStateConstraint.Complete:
+    if t.state == 'complete' and constraint & TournamentStateConstraint.Complete:
         return True
 
     return False
 
 
-async def get_current_matches_repr(account, t):
-    matches, exc = await get_matches(account, t, 'open')
-    if exc:
-        return None, exc
-
-    participants, exc = await get_participants(account, t)
-    if exc:
-        return None, exc
-
+def iter_current_matches_lines(t):
+    matches = t.matches_in_state('open')
     matches.sort(key=match_sort_by_round)
 
-    bracketType = 1 if t['tournament-type'] == 'single elimination' else 0
+    bracketType = 1 if t.tournament_type == 'single elimination' else 0
 
-    desc = []
     for m in matches:
-        if t['tournament-type'] in ['single elimination', 'double elimination']:
-            if m['round'] > 0 and bracketType != 1:
-                desc.append('\n         Winners bracket:')
+        if t.is_elimination:
+            if m.round > 0 and bracketType != 1:
+                yield ''
+                yield '         Winners bracket:'
                 bracketType = 1
-            elif m['round'] < 0 and bracketType != 2:
-                desc.append('\n         Losers bracket:')
+            elif m.round < 0 and bracketType != 2:
+                yield ''
+                yield '         Losers bracket:'
                 bracketType = 2
         else:
             if bracketType == 0:
-                desc.append('\n         Open matches:')
+                yield ''
+                yield '         Open matches:'
                 bracketType = 1
 
-        p1 = [p for p in participants if p['id'] == m['player1-id']][0]
-        p2 = [p for p in participants if p['id'] == m['player2-id']][0]
-        desc.append('           > {0:20} 🆚 {1:>20}'.format('`' + p1['name'] + '`', '`' + p2['name'] + '`'))
+        yield '           > {0:20} 🆚 {1:>20}'.format('`' + m.player1.name + '`', '`' + m.player2.name + '`')
 
-    return '\n'.join(desc), None
 
+def get_current_matches_repr(t):
+    return '\n'.join(iter_current_matches_lines(t))
 
-async def get_final_ranking_repr(account, t):
-    participants, exc = await get_participants(account, t)
-    if exc:
-        return None, exc
 
-    info = []
-    info.append('Final standings:')
-    participants.sort(key=player_sort_by_rank)
+def iter_final_ranking_lines(t):
+    yield 'Final standings:'
     lastRank = 0
-    for p in participants:
-        if lastRank < p['final-rank']:
-            info.append('Position #%d' % p['final-rank'])
-            lastRank = p['final-rank']
-        info.append('\t' + p['name'])
-    return '\n'.join(info), None
-
-
-async def get_open_match_dependancy(account, t_id, m, p_id):
-    if m['player1-id'] == p_id:
-        if 'player2-prereq-match-id' in m:
-            waiting_on_match_id = m['player2-prereq-match-id']
-            waiting_for_loser = m['player2-is-prereq-match-loser']
-        else:
-            return None, '✅ You have a pending match with no dependancy!?'
-    elif m['player2-id'] == p_id:
-        if 'player1-prereq-match-id' in m:
-            waiting_on_match_id = m['player1-prereq-match-id']
-            waiting_for_loser = m['player1-is-prereq-match-loser']
-        else:
-            return None, '✅ You have a pending match with no dependancy!?'
-    else:
-        return None, '✅ Couldn\'t find participant'
+    for p in sorted(t.participants, key=player_sort_by_rank):
+        if lastRank < p.final_rank:
+            yield 'Position #%d' % p.final_rank
+            lastRank = p.final_rank
+        yield '\t' + p.name
 
-    try:
-        waiting_on_m = await account.matches.show(t_id, waiting_on_match_id)
-    except ChallongeException as e:
-        log_challonge.error('failed waiting_on_m %s - %s' % (waiting_on_match_id, e))
-        return None, T_OnChallongeException.format(e)
 
-    if not waiting_on_m['player1-id'] or not waiting_on_m['player2-id']:
-        return 'you are waiting for more than one match', None
-    else:
-        try:
-            p1 = await account.participants.show(t_id, waiting_on_m['player1-id'])
-            p2 = await account.participants.show(t_id, waiting_on_m['player2-id'])
-        except ChallongeException as e:
-            log_challonge.error('failed p1 (%s) or p2 (%s) - %s' % (waiting_on_m['player1-id'], waiting_on_m['player2-id'], e))
-            return None, T_OnChallongeException.format(e)
-        else:
-            loser_txt = '`Loser`' if waiting_for_loser else '`Winner`'
-            return 'you are waiting on the %s of %s 🆚 %s' % (loser_txt, p1['name'], p2['name']), None
+def get_final_ranking_repr(t):
+    return '\n'.join(iter_final_ranking_lines(t))
 
 
-async def get_next_match(account, t_id, name):
-    participant, exc = await get_participant(account, t_id, name)
-    if exc:
-        return None, exc
+def get_newly_open_matches(previous_t, t):
+    """Matches of t open now that were not open in previous_t (previous snapshot of the same tournament)"""
+    previously_open = set(m.id for m in previous_t.matches_in_state('open'))
+    return [m for m in t.matches_in_state('open') if m.id not in previously_open]
 
-    if not participant:
-        return None, '❌ Participant \'%s\' not found' % name
-
-    if participant['final-rank'] is not None:
-        return '✅ %s, tournament is over and you endend up at rank #%s' % (name, participant['final-rank']), None
 
-    p_id = participant['id']
-    try:
-        openMatches = await account.matches.index(t_id, state='open', participant_id=p_id)
-    except ChallongeException as e:
-        return None, T_OnChallongeException.format(e)
-
-    if len(openMatches) > 0:
-        if openMatches[0]['player1-id'] == p_id:
-            opponent_id = openMatches[0]['player2-id']
-        else:
-            opponent_id = openMatches[0]['player1-id']
-
-        try:
-            opponent = await account.participants.show(t_id, opponent_id)
-        except ChallongeException as e:
-            return None, T_OnChallongeException.format(e)
-
-        return '✅ %s, you have an open match 🆚 %s' % (name, opponent['name']), None
-
-    try:
-        pendingMatches = await account.matches.index(t_id, state='pending', participant_id=p_id)
-    except ChallongeException as e:
-        return None, T_OnChallongeException.format(e)
+def get_open_match_dependancy(t, m, p_id):
+    if m.player1_id == p_id:
+        waiting_on_match_id = m.player2_prereq_id
+        waiting_for_loser = m.player2_is_prereq_loser
+    elif m.player2_id == p_id:
+        waiting_on_match_id = m.player1_prereq_id
+        waiting_for_loser = m.player1_is_prereq_loser
+    else:
+        log_challonge.error('participant %s not in match %s' % (p_id, m.id))
+        return None
 
-    if len(pendingMatches) > 0:
-        msg, exc = await get_open_match_dependancy(account, t_id, pendingMatches[0], p_id)
-        if exc:
-            log_challonge.error(exc)
-            return '✅ %s, you have a pending match. Please wait for it to open' % name, None
+    if not waiting_on_match_id:
+        log_challonge.error('pending match %s with no dependancy' % m.id)
+        return None
 
-        return '✅ %s, %s' % (name, msg), None
+    waiting_on_m = t.match(waiting_on_match_id)
+    if not waiting_on_m:
+        log_challonge.error('failed waiting_on_m %s' % waiting_on_match_id)
+        return None
 
-    return '✅ %s, you have no pending nor open match. It seems you\'re out of the tournament' % name, None
+    if not waiting_on_m.player1 or not waiting_on_m.player2:
+        return 'you are waiting for more than one match'
 
+    loser_txt = '`Loser`' if waiting_for_loser else '`Winner`'
+    return 'you are waiting on the %s of %s 🆚 %s' % (loser_txt, waiting_on_m.player1.name, waiting_on_m.player2.name)
 
-def find(cont, key, value):
-    found = [x for x in cont if x[key] == value]
-    if len(found) > 0:
-        return found[0]
-    return None
 
+def get_next_match(t, participant, name):
+    if not participant:
+        return '❌ Participant \'%s\' not found' % name
 
-async def get_blocking_matches(account, t_id):
-    try:
-        t = await account.tournaments.show(t_id, include_participants=1, include_matches=1)
-    except ChallongeException as e:
-        return None, T_OnChallongeException.format(e)
+    if participant.final_rank is not None:
+        return '✅ %s, tournament is over and you endend up at rank #%s' % (name, participant.final_rank)
 
-    if len(t['matches']) == 0:
-        return '✅ No blocking matches!', None
-
-    matches = t['matches']
-    participants = t['participants']
-    blocking = {}
-
-    def process_prereq_match(m, player, blocked):
-        key = '%s-prereq-match-id' % player
-        if key in m and m[key]:
-            found = False
-            for k, v in blocking.items():
-                if m[key] in v:
-                    log_challonge.debug('%s is already in blocked matches of %s - adding %s' % (m[key], k, m['id']))
-                    blocking[k].append(m['id'])
-                    found = True
-            if not found:
-                log_challonge.debug('Adding %s to the blocked list' % m[key])
-                blocked.append(m['id'])
-                return m[key]
-        return None
+    openMatches = participant.matches_in_state('open')
+    if len(openMatches) > 0:
+        opponent = openMatches[0].opponent_of(participant.id)
+        return '✅ %s, you have an open match 🆚 %s' % (name, opponent.name)
 
-    def check_match(m_id, blocked):
-        for k, v in blocking.items():
-            if m_id in v:
-                log_challonge.debug('%s is already in blocked matches of %s - adding %s' % (m_id, k, blocked))
-                blocking[k].extend(blocked)
-                return
-        m = find(matches, 'id', m_id)
-        if not m:
-            log_challonge.debug('no match with id #%s' % m_id)
-            return
-        debug_p1Name = 'None' if not m['player1-id'] else find(participants, 'id', m['player1-id'])['name']
-        debug_p2Name = 'None' if not m['player2-id'] else find(participants, 'id', m['player2-id'])['name']
-        log_challonge.debug('check_match %s: %s Vs %s (%s)' % (m_id, debug_p1Name, debug_p2Name, m['state']))
-        if m['state'] == 'pending':
-            processed = process_prereq_match(m, 'player1', blocked)
-            if processed:
-                log_challonge.debug('%s needs to dive deeper' % processed)
-                check_match(processed, blocked)
-            processed = process_prereq_match(m, 'player2', blocked)
-            if processed:
-                blocked.append(processed)
-                log_challonge.debug('%s needs to dive deeper' % processed)
-                check_match(processed, blocked)
-        elif m['state'] == 'open':
-            if m_id in blocking:
-                blocking[m_id].extend(blocked)
-            else:
-                blocking.update({m_id: blocked})
-        log_challonge.debug(blocking)
+    pendingMatches = participant.matches_in_state('pending')
+    if len(pendingMatches) > 0:
+        msg = get_open_match_dependancy(t, pendingMatches[0], participant.id)
+        if not msg:
+            return '✅ %s, you have a pending match. Please wait for it to open' % name
+
+        return '✅ %s, %s' % (name, msg)
+
+    return '✅ %s, you have no pending nor open match. It seems you\'re out of the tournament' % name
+
+
+def get_blocked_matches(t):
+    """Open match id -> ids of the pending matches it blocks
+
+    A pending match is blocked by every open match leading to one of its empty slots, as long as
+    someone is waiting on it or on a match it leads to
+    """
+    # pending match id -> prerequisite matches feeding one of its still empty slots
+    waits_on = {}
+    for m in t.matches:
+        if m.state == 'pending':
+            waits_on[m.id] = [prereq_id for seated_id, prereq_id in [(m.player1_id, m.player1_prereq_id), (m.player2_id, m.player2_prereq_id)]
+                              if not seated_id and prereq_id and t.match(prereq_id)]
+
+    # topological order of pending matches: prerequisites first (Kahn)
+    consumers = {}
+    missing = {}
+    for m_id, prereqs in waits_on.items():
+        missing[m_id] = len([x for x in prereqs if x in waits_on])
+        for x in prereqs:
+            consumers.setdefault(x, []).append(m_id)
+    order = [m_id for m_id, count in missing.items() if count == 0]
+    for m_id in order:  # grows while iterating
+        for c in consumers.get(m_id, []):
+            missing[c] -= 1
+            if missing[c] == 0:
+                order.append(c)
+
+    # relevant pending match id -> itself and every relevant match it leads to, consumers first.
+    # A match is relevant when someone is waiting on it, or when it lies on the way to such a match
+    reach = {}
+    for m_id in reversed(order):
+        below = [reach[c] for c in consumers.get(m_id, []) if c in reach]
+        m = t.match(m_id)
+        if below or m.player1_id or m.player2_id:
+            reach[m_id] = set([m_id]).union(*below)
+
+    # an open match blocks every relevant match it leads to, whichever empty slot it feeds
+    blocked = {}
+    for m in t.matches:
+        if m.state != 'open':
+            continue
+        below = [reach[c] for c in consumers.get(m.id, []) if c in reach]
+        if below:
+            blocked[m.id] = set().union(*below)
+    return blocked
+
+
+def get_blocking_matches(t):
+    if len(t.matches) == 0:
+        return '✅ No blocking matches!'
+
+    blocked_count = {m_id: len(blocked) for m_id, blocked in get_blocked_matches(t).items()}
+    log_challonge.debug(blocked_count)
 
-    for m in matches:
-        if m['state'] == 'pending' and (m['player1-id'] or m['player2-id']):
-            found = False
-            for k, v in blocking.items():
-                if m['id'] in v:
-                    log_challonge.debug('%s is already in blocked matches of %s' % (m['id'], k))
-                    found = True
-            if not found:
-                log_challonge.debug('Checking blockers for %s' % m['id'])
-                blocked = [m['id']]
-                if not m['player1-id'] and 'player1-prereq-match-id' in m and m['player1-prereq-match-id']:
-                    check_match(m['player1-prereq-match-id'], blocked)
-                if not m['player2-id'] and 'player2-prereq-match-id' in m and m['player2-prereq-match-id']:
-                    check_match(m['player2-prereq-match-id'], blocked)
-
-    sorted_m = sorted(blocking.items(), key=lambda x: len(x[1]), reverse=True)
-    log_challonge.debug(sorted_m)
     msg = ['✅ Blocking matches:']
-    for tup_m in sorted_m:
-        m = find(matches, 'id', tup_m[0])
-        if m:
-            p1 = find(participants, 'id', m['player1-id'])
-            p2 = find(participants, 'id', m['player2-id'])
-            msg.append('`%s game%s blocked` by: %s 🆚 %s' % (len(tup_m[1]), 's' if len(tup_m[1]) > 1 else '', p1['name'], p2['name']))
-    return '\n '.join(msg), None
+    for m in sorted([m for m in t.matches if m.id in blocked_count], key=lambda x: blocked_count[x.id], reverse=True):
+        count = blocked_count[m.id]
+        msg.append('`%s game%s blocked` by: %s 🆚 %s' % (count, 's' if count > 1 else '', m.player1.name, m.player2.name))
+    return '\n '.join(msg)
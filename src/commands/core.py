@@ -5,7 +5,9 @@ import discord
 from discord_impl.permissions import Permissions, get_permissions
 from discord_impl.channel_type import ChannelType, get_channel_type
 from challonge_impl.accounts import ChallongeAccess, get as get_account
+from challonge_impl.breaker import ChallongeUnavailable
 from challonge_impl.utils import validate_tournament_state
+from challonge_impl.snapshot import TournamentSnapshot
 from database.core import db
 from utils import print_array
 from log import log_commands_core
@@ -49,6 +51,7 @@ class Attributes:
         self.channelRestrictions = kwargs.get('channelRestrictions', ChannelType.Other)
         self.challongeAccess = kwargs.get('challongeAccess', ChallongeAccess.NotRequired)
         self.tournamentState = kwargs.get('tournamentState', None)
+        self.readOnly = kwargs.get('readOnly', False)  # may answer from a recent stored snapshot, or the last known one when Challonge is unavailable
 
 
 class Command:
@@ -95,9 +98,15 @@ class Command:
             acc, exc = await get_account(context_cache['db_tournament'].host_id)
             if exc:
                 return False, exc
+            if acc and 'snapshot' not in context_cache:
+                # shared by validation, helpers and the command body (and by every command when listing them in help)
+                context_cache['snapshot'] = TournamentSnapshot(acc, context_cache['db_tournament'].challonge_id)
             if acc and self.attributes.tournamentState:
-                if not await validate_tournament_state(acc, context_cache['db_tournament'].challonge_id, self.attributes.tournamentState):  # can raise
-                    return False, BadTournamentState()
+                try:
+                    if not await validate_tournament_state(context_cache['snapshot'], self.attributes.tournamentState, self.attributes.readOnly):  # can raise
+                        return False, BadTournamentState()
+                except ChallongeUnavailable as e:
+                    return False, e
 
         reqParamsExpected = len(self.reqParams)
         givenParams = len(postCommand)
@@ -123,6 +132,8 @@ class Command:
                     kwargs[x], exc = await get_account(context_cache['db_tournament'].host_id)
             elif x == 'tournament_id':
                 kwargs[x] = context_cache['db_tournament'].challonge_id
+            elif x == 'snapshot':
+                kwargs[x] = context_cache['snapshot']
             elif x == 'tournament_role':
                 roleid = context_cache['db_tournament'].role_id
                 kwargs[x] = discord.utils.find(lambda r: r.id == roleid, message.server.roles)
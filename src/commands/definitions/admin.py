@@ -68,6 +68,13 @@ async def dump(client, message, **kwargs):
                 a.add(name_id_fmt. format(user), str(u.challonge_user_name))
         for page in paginate(a.get(), maxChars):
             await client.send_message(message.author, decorate(page))
+    if what is None or what == 'queue':
+        a = ArrayFormater('Outbound queue', 6)
+        a.add('Route (ID)', 'Depth', 'Requests', 'Calls', 'Avg wait', 'Max wait')
+        for route, major_id, depth, requests, calls, wait_avg, wait_max in client.queue_metrics():
+            a.add('{0} ({1})'.format(route, major_id), str(depth), str(requests), str(calls), '%.2fs' % wait_avg, '%.2fs' % wait_max)
+        for page in paginate(a.get(), maxChars):
+            await client.send_message(message.author, decorate(page))
     if what is None or what == 'tournaments':
         acc, exc = await get_account(app_config['devid'])
         if not acc:
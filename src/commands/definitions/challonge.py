@@ -1,24 +1,37 @@
 import datetime
+import io
+import itertools
+import re
 import string
+import tempfile
 
 import discord
 from challonge import ChallongeException
 
-from const import C_RoleName, T_ChannelDescriptionSeparator, T_OnChallongeException, T_TournamentCreated
-from utils import get_user_id_from_mention
+from const import (C_RoleName, C_ChallongeConcurrency, C_DiscordConcurrency, C_BulkAddChunk, C_MessageMaxLength, C_MaxPages, C_AttachmentMaxBytes,
+                   C_NotificationBatch, C_NotificationInterval, C_TopicUpdateDelay, T_MatchReady_DM, T_MatchReady_Channel,
+                   T_ChannelDescriptionSeparator, T_OnChallongeException, T_TournamentCreated, T_StaleSnapshot, T_InvalidTournamentType, T_SentAsFile, T_DiscordErrors)
+from utils import get_user_id_from_mention, gather_all, gather_bounded, gather_paced, ArrayFormater, Debouncer, paginate, paginate_lines
 from log import log_commands_def
 from database.core import db
 from commands.core import cmds, aliases, required_args, optional_args, helpers
 from modules.core import modules
 from discord_impl.permissions import Permissions
 from discord_impl.channel_type import ChannelType
-from challonge_impl.accounts import ChallongeAccess, TournamentStateConstraint
+from discord_impl.client import Priority
+from challonge_impl.accounts import ChallongeAccess, TournamentStateConstraint, get as get_account
 from challonge_impl.events import Events
+from challonge_impl.bracket import Tournament
+from challonge_impl.snapshot import snapshots, renders
+from challonge_impl.ratings import record_tournament_results
+from challonge_impl.eta import get_eta_repr
+from challonge_impl.images import bracket_images
+from challonge_impl.export import export_formats
+from challonge_impl.scoreboard import scoreboards
 from challonge_impl.utils import (TournamentState, get_channel_desc, get_date, get_time,
-                                  get_current_matches_repr, get_final_ranking_repr,
-                                  verify_score_format, get_players, get_player, get_next_match,
-                                  get_match, author_is_winner, reverse_score, update_score,
-                                  get_blocking_matches)
+                                  verify_score_format, get_player, get_member_participant, get_next_match,
+                                  backfill_tournament_users, get_match, author_is_winner, reverse_score, update_score,
+                                  get_blocking_matches, iter_status_lines, get_newly_open_matches)
 
 
 def get_member(name, server):
@@ -29,24 +42,125 @@ def get_member(name, server):
         return discord.utils.get(server.members, id=member_id)
 
 
-async def update_channel_topic(account, t, client, channel):
-    desc, exc = await get_channel_desc(account, t)
-    if exc:
-        await client.send_message(channel, exc)
-    elif desc:
+topic_updates = Debouncer(C_TopicUpdateDelay)
+applied_topics = {}  # channel id -> last topic set by the bot
+
+
+async def apply_channel_topic(t, client, channel):
+    desc = get_channel_desc(t)
+    if desc:
         currentTopic = channel.topic or ''
         index = -1
         if currentTopic and len(currentTopic) > 0:
             index = currentTopic.find(T_ChannelDescriptionSeparator)
             if index > -1:
                 currentTopic = currentTopic[:index]
-        await client.edit_channel(channel, topic=currentTopic + T_ChannelDescriptionSeparator + desc)
+        topic = currentTopic + T_ChannelDescriptionSeparator + desc
+        # channel.topic is only refreshed by the gateway, possibly after the next update
+        if topic in [channel.topic, applied_topics.get(channel.id)]:
+            return
+        await client.edit_channel(channel, topic=topic, priority=Priority.Notice)
+        applied_topics[channel.id] = topic
         # Todo: Module!!
 
 
+async def update_channel_topic(t, client, channel):
+    """Schedules the update of the channel topic (and scoreboard) with this tournament data
+    Updates are coalesced per channel: the latest data is applied once the debounce window closes
+    """
+    scoreboards.update(client, channel, t)
+    topic_updates.schedule(channel.id, apply_channel_topic, t, client, channel)
+
+
+def with_stale_notice(snapshot, msg):
+    if snapshot.as_of:
+        return T_StaleSnapshot.format(snapshot.as_of) + '\n' + msg
+    return msg
+
+
+async def send_paginated(client, channel, lines, filename, priority=Priority.Reply):
+    """Sends the lines in as many messages as needed, as a text file beyond C_MaxPages messages
+    Pages are rendered as they are sent: only the first ones are held to decide between the two
+    """
+    pages = paginate_lines(lines, C_MessageMaxLength)
+    first_pages = list(itertools.islice(pages, C_MaxPages + 1))
+    if len(first_pages) <= C_MaxPages:
+        for page in first_pages:
+            await client.send_message(channel, page, priority=priority)
+        return
+
+    with tempfile.TemporaryFile() as f:
+        for page in itertools.chain(first_pages, pages):
+            f.write(page.encode('utf-8'))
+            f.write(b'\n')
+        f.seek(0)
+        await client.send_file(channel, f, filename=filename, content=T_SentAsFile, priority=priority)
+
+
+async def notify_open_matches(client, channel, previous_t, t):
+    """Tells the players of the matches opened since previous_t that they can play
+    By direct message, in batches, and with a single mention in the tournament channel
+    for the players who could not be reached that way
+    """
+    matches = get_newly_open_matches(previous_t, t)
+    if not matches:
+        return
+    members = {}
+    for x in db.get_tournament_users(str(t.id)):
+        if x.participant_id is not None:
+            members[int(x.participant_id)] = channel.server.get_member(x.discord_id)
+
+    async def send_dm(member, opponent):
+        try:
+            await client.send_message(member, T_MatchReady_DM.format(opponent.name, t.name, channel.mention), priority=Priority.Notice)
+        except discord.errors.HTTPException:
+            return False
+        return True
+
+    dms = []
+    for m in matches:
+        for player, opponent in [(m.player1, m.player2), (m.player2, m.player1)]:
+            if members.get(player.id):
+                dms.append((m, player, send_dm(members[player.id], opponent)))
+    sent = await gather_paced([dm for _, _, dm in dms], C_NotificationBatch, C_NotificationInterval)
+    reached = set((m.id, player.id) for (m, player, _), ok in zip(dms, sent) if ok)
+
+    def mention(m, player):
+        return player.name if (m.id, player.id) in reached or not members.get(player.id) else members[player.id].mention
+
+    lines = ['           > {0} 🆚 {1}'.format(mention(m, m.player1), mention(m, m.player2))
+             for m in matches if (m.id, m.player1.id) not in reached or (m.id, m.player2.id) not in reached]
+    if lines:
+        await send_paginated(client, channel, [T_MatchReady_Channel] + lines, 'matches.txt', Priority.Notice)
+
+
+async def send_bracket_image(client, channel, t, version):
+    png = await bracket_images.get(t, version)
+    if png:
+        try:
+            await client.send_file(channel, io.BytesIO(png), filename='bracket.png')
+        except discord.errors.HTTPException:
+            log_commands_def.exception('')
+
+
+async def add_role_safe(client, member, role):
+    try:
+        await client.add_roles(member, role)
+    except discord.errors.HTTPException:
+        log_commands_def.exception('')
+        return False
+    return True
+
+
 # ORGANIZER
 
 
+tournament_types = {'singleelim': 'single elimination',
+                    'doubleelim': 'double elimination',
+                    'roundrobin': 'round robin',
+                    'swiss': 'swiss'}
+
+
 @helpers('account')
 @aliases('new')
 @optional_args('subdomain')
@@ -73,17 +187,10 @@ async def create(client, message, **kwargs):
         await client.send_message(message.channel, '❌ Invalid url {}. Please use only letters, numbers and underscores'.format(kwargs.get('url')))
         return
     # Validate type
-    if kwargs.get('type') not in ['singleelim', 'doubleelim', 'roundrobin', 'swiss']:
-        await client.send_message(message.channel, '❌ Invalid tournament type {}. Please choose from singleelim, doubleelim, roundrobin or swiss'.format(kwargs.get('type')))
-        return
-    if kwargs.get('type') == 'singleelim':
-        tournament_type = 'single elimination'
-    elif kwargs.get('type') == 'doubleelim':
-        tournament_type = 'double elimination'
-    elif kwargs.get('type') == 'roundrobin':
-        tournament_type = 'round robin'
-    else:
-        tournament_type = 'swiss'
+    tournament_type = tournament_types.get(kwargs.get('type'))
+    if not tournament_type:
+        await client.send_message(message.channel, T_InvalidTournamentType.format(kwargs.get('type')))
+        return
 
     params = {}
     if kwargs.get('subdomain', None):
@@ -94,17 +201,164 @@ async def create(client, message, **kwargs):
     except ChallongeException as e:
         await client.send_message(message.channel, T_OnChallongeException.format(e))
     else:
-        role = await client.create_role(message.server, name='Participant_' + kwargs.get('name'), mentionable=True)
-        chChannel = await client.create_channel(message.server, 'T_' + kwargs.get('name'))
+        (role, chChannel), errors = await gather_all(client.create_role(message.server, name='Participant_' + kwargs.get('name'), mentionable=True),
+                                                     client.create_channel(message.server, 'T_' + kwargs.get('name')))
+        if errors:
+            # no half-bound tournament: remove what was created
+            await gather_all(*([client.delete_role(message.server, role)] if role else []) + ([client.delete_channel(chChannel)] if chChannel else []))
+            await client.send_message(message.channel, T_DiscordErrors.format(', '.join(str(e) for e in errors)) +
+                                      '\nThe tournament has been created on Challonge: ' + t['full-challonge-url'])
+            return
         db.add_tournament(t['id'], chChannel, role.id, message.author.id)
         await client.send_message(message.channel, T_TournamentCreated.format(kwargs.get('name'),
                                                                               t['full-challonge-url'],
                                                                               role.mention,
                                                                               chChannel.mention))
-        await update_channel_topic(kwargs.get('account'), t, client, chChannel)
+        await update_channel_topic(Tournament(t), client, chChannel)
         await modules.on_state_change(message.server.id, TournamentState.pending, t_name=kwargs.get('name'), me=message.server.me)
 
 
+def snake_pools(players, pool_count):
+    """Distributes players (best seed first) across pools: 1 2 3 3 2 1 1 2 3..."""
+    pools = [[] for _ in range(pool_count)]
+    for index, player in enumerate(players):
+        row, position = divmod(index, pool_count)
+        pools[position if row % 2 == 0 else pool_count - 1 - position].append(player)
+    return pools
+
+
+@helpers('account')
+@aliases('pools')
+@required_args('name', 'url', 'type', 'count')
+@cmds.register(minPermissions=Permissions.Organizer,
+               channelRestrictions=ChannelType.Mods,
+               challongeAccess=ChallongeAccess.RequiredForAuthor)
+async def createpools(client, message, **kwargs):
+    """Create pool tournaments and distribute the players across them
+    Required Arguments:
+    name -- base name of the pools, suffixed by the pool number (no spaces)
+    url -- base url of the pools, suffixed by the pool number (letters, numbers, and underscores only)
+    type -- can be [singleelim, doubleelim, roundrobin, swiss]
+    count -- number of pools (2 to 16)
+    Players are listed after the command, best seed first, one mention or name per line
+    """
+    diff = set(kwargs.get('url')) - set(string.ascii_letters + string.digits + '_')
+    if diff or len(kwargs.get('name')) > 57:
+        await client.send_message(message.channel, '❌ Invalid name or url. Please use less than 57 characters, and only letters, numbers and underscores for the url')
+        return
+    tournament_type = tournament_types.get(kwargs.get('type'))
+    if not tournament_type:
+        await client.send_message(message.channel, T_InvalidTournamentType.format(kwargs.get('type')))
+        return
+    if not kwargs.get('count').isdigit() or not 2 <= int(kwargs.get('count')) <= 16:
+        await client.send_message(message.channel, '❌ Invalid number of pools. Please choose between 2 and 16')
+        return
+
+    players = []
+    unknown = []
+    for line in [l.strip() for l in message.content.splitlines()[1:] if l.strip()]:
+        member = get_member(line, message.server)
+        if member and member not in players:
+            players.append(member)
+        elif not member:
+            unknown.append(line)
+    pools = snake_pools(players, int(kwargs.get('count')))
+
+    async def create_pool(index, members):
+        name = '{0}_{1}'.format(kwargs.get('name'), index + 1)
+        try:
+            t = await kwargs.get('account').tournaments.create(name, '{0}_{1}'.format(kwargs.get('url'), index + 1), tournament_type)
+            participants = await kwargs.get('account').participants.bulk_add(t['id'], [m.name for m in members]) if members else []
+        except ChallongeException as e:
+            return name, None, T_OnChallongeException.format(e)
+        (role, channel), errors = await gather_all(client.create_role(message.server, name='Participant_' + name, mentionable=True),
+                                                   client.create_channel(message.server, 'T_' + name))
+        if errors:
+            await gather_all(*([client.delete_role(message.server, role)] if role else []) + ([client.delete_channel(channel)] if channel else []))
+            return name, None, '❌ Created on Challonge ({0}) but Discord failed: {1}'.format(t['full-challonge-url'], ', '.join(str(e) for e in errors))
+        by_name = {m.name: m for m in members}
+        users = [(by_name[p['name']], p['id']) for p in participants if p['name'] in by_name]
+        return name, (t, role, channel, users), None
+
+    created = await gather_bounded([create_pool(index, members) for index, members in enumerate(pools)], C_ChallongeConcurrency)
+
+    # every binding of every pool recorded at once
+    pools_created = [pool for _, pool, _ in created if pool]
+    db.add_tournaments([(str(t['id']), channel, role.id, message.author.id) for t, role, channel, _ in pools_created],
+                       [(str(t['id']), member.id, str(p_id)) for t, _, _, users in pools_created for member, p_id in users])
+    await gather_bounded([add_role_safe(client, member, role) for _, role, _, users in pools_created for member, _ in users], C_DiscordConcurrency)
+
+    a = ArrayFormater('Pools', 3)
+    a.add('Pool', 'Players', 'Result')
+    for (name, pool, error), members in zip(created, pools):
+        a.add(name, str(len(members)), error or '✅ ' + pool[2].mention)
+    info = ['```\n' + a.get() + '```']
+    if unknown:
+        info.append('⚠ Not found on this server: %s' % ', '.join(unknown))
+    await client.send_message(message.channel, '\n'.join(info))
+
+    for t, _, channel, _ in pools_created:
+        await update_channel_topic(Tournament(t), client, channel)
+    if pools_created:
+        await modules.on_state_change(message.server.id, TournamentState.pending, t_name=kwargs.get('name'), me=message.server.me)
+
+
+@aliases('archive')
+@optional_args('format')
+@cmds.register(minPermissions=Permissions.Organizer,
+               channelRestrictions=ChannelType.Mods)
+async def export(client, message, **kwargs):
+    """Export the participants, matches and scores of tournaments as a file
+    Optional Arguments:
+    format -- can be [csv, jsonl] (default: csv)
+    Tournaments can be listed after the command, one channel mention or Challonge id per line
+    All the tournaments of this server are exported otherwise
+    """
+    export_format = (kwargs.get('format') or 'csv').lower()
+    if export_format not in export_formats:
+        await client.send_message(message.channel, '❌ Invalid format {0}. Please choose from {1}'.format(export_format, ', '.join(export_formats)))
+        return
+
+    db_tournaments = list(db.get_tournaments(message.server.id))
+    wanted = [re.sub(r'[<#>]', '', l.strip()) for l in message.content.splitlines()[1:] if l.strip()]
+    if wanted:
+        db_tournaments = [x for x in db_tournaments if x.channel_id in wanted or str(x.challonge_id) in wanted]
+    if not db_tournaments:
+        await client.send_message(message.channel, '❌ No tournament to export')
+        return
+
+    errors = []
+    exported = 0
+    with tempfile.TemporaryFile() as f:
+        text = io.TextIOWrapper(f, encoding='utf-8', newline='', write_through=True)
+        writer = export_formats[export_format](text)
+        # one tournament at a time, fetched directly and not kept in the snapshot store:
+        # only the file grows with the number of tournaments. No stale data is exported
+        for db_t in db_tournaments:
+            account, exc = await get_account(db_t.host_id)
+            if exc:
+                errors.append('{0}: {1}'.format(db_t.challonge_id, exc))
+                continue
+            try:
+                t = Tournament(await account.tournaments.show(db_t.challonge_id, include_participants=1, include_matches=1))
+            except ChallongeException as e:
+                errors.append('{0}: {1}'.format(db_t.challonge_id, e))
+                continue
+            writer.write(t)
+            exported += 1
+        text.detach()
+
+        info = ['✅ %d tournament(s) exported' % exported]
+        info.extend('⚠ ' + e for e in errors)
+        if f.tell() > C_AttachmentMaxBytes:
+            info[0] = '❌ The export is too big to be uploaded. Please list fewer tournaments'
+        elif exported:
+            f.seek(0)
+            await client.send_file(message.channel, f, filename='tournaments.' + export_format, content='\n'.join(info))
+            return
+    await client.send_message(message.channel, '\n'.join(info))
+
+
 @helpers('account', 'tournament_id')
 @aliases('shuffle', 'randomize')
 @cmds.register(minPermissions=Permissions.Organizer,
@@ -137,43 +391,31 @@ async def start(client, message, **kwargs):
     No Arguments
     """
     try:
-        t = await kwargs.get('account').tournaments.start(kwargs.get('tournament_id'))
+        raw = await kwargs.get('account').tournaments.start(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
     else:
-        overwrite = discord.PermissionOverwrite()
-        overwrite.send_messages = True
-        await client.edit_channel_permissions(message.channel, kwargs.get('tournament_role'), overwrite)
-
-        for r in message.server.me.roles:
-            if r.name == C_RoleName:
-                await client.edit_channel_permissions(message.channel, r, overwrite)
-
-        overwrite = discord.PermissionOverwrite()
-        overwrite.send_messages = False
-        await client.edit_channel_permissions(message.channel, message.server.default_role, overwrite)
+        version = snapshots.put(kwargs.get('tournament_id'), raw, own_change=True)
+        t = snapshots.model(kwargs.get('tournament_id'), raw, version)
+        allowed = discord.PermissionOverwrite()
+        allowed.send_messages = True
+        denied = discord.PermissionOverwrite()
+        denied.send_messages = False
+        roles = [kwargs.get('tournament_role')] + [r for r in message.server.me.roles if r.name == C_RoleName]
+        _, errors = await gather_all(*[client.edit_channel_permissions(message.channel, r, allowed) for r in roles] +
+                                     [client.edit_channel_permissions(message.channel, message.server.default_role, denied)])
         await client.send_message(message.channel, '✅ Tournament is now started!')
-        await update_channel_topic(kwargs.get('account'), t, client, message.channel)
-        await modules.on_state_change(message.server.id, TournamentState.underway, t_name=t['name'], me=message.server.me)
+        if errors:
+            log_commands_def.error('start: ' + ', '.join(str(e) for e in errors))
+            await client.send_message(message.channel, T_DiscordErrors.format(', '.join(str(e) for e in errors)))
+        backfill_tournament_users(t, message.server)
+        await update_channel_topic(t, client, message.channel)
+        await modules.on_state_change(message.server.id, TournamentState.underway, t_name=t.name, me=message.server.me)
         # TODO real text (with games to play...)
-        """
-        process = cloudconvertapi.convert({
-            "inputformat": "svg",
-            "outputformat": "png",
-            "input": "download",
-            "file": t['live-image-url']
-        })
-        process.wait()
-        process.download(localfile='data/temp.png')
-        await client.send_file(message.channel, 'data/temp.png')
-        try:
-            os.remove('data/temp.png')
-        except OSError as e:
-            log_commands_def.error("Error: %s - %s." % (e.filename,e.strerror))
-        """
+        await send_bracket_image(client, message.channel, t, version)
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -190,16 +432,16 @@ async def reset(client, message, **kwargs):
     else:
         await client.send_message(message.channel, '✅ Tournament has been reset!')
         try:
-            t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'))
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException as e:
             log_commands_def.error('reset exc=: %s' % e)
         else:
-            await update_channel_topic(kwargs.get('account'), t, client, message.channel)
-            await modules.on_state_change(message.server.id, TournamentState.pending, t_name=t['name'], me=message.server.me)
+            await update_channel_topic(t, client, message.channel)
+            await modules.on_state_change(message.server.id, TournamentState.pending, t_name=t.name, me=message.server.me)
         # TODO real text ?
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @required_args('date', 'time', 'duration')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
@@ -246,15 +488,15 @@ async def checkin_setup(client, message, **kwargs):
         await client.send_message(message.channel, '✅ Start date and check-in duration have been processed')
 
         try:
-            t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException:
             log_commands_def.exception('')
         else:
-            await update_channel_topic(kwargs.get('account'), t, client, message.channel)
+            await update_channel_topic(t, client, message.channel)
         # TODO real text ?
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -271,15 +513,15 @@ async def checkin_validate(client, message, **kwargs):
     else:
         await client.send_message(message.channel, '✅ Check-ins have been processed')
         try:
-            t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException:
             log_commands_def.exception('')
         else:
-            await update_channel_topic(kwargs.get('account'), t, client, message.channel)
+            await update_channel_topic(t, client, message.channel)
         # TODO real text ?
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -295,15 +537,15 @@ async def checkin_abort(client, message, **kwargs):
     else:
         await client.send_message(message.channel, '✅ Check-ins have been aborted')
         try:
-            t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException:
             log_commands_def.exception('')
         else:
-            await update_channel_topic(kwargs.get('account'), t, client, message.channel)
+            await update_channel_topic(t, client, message.channel)
         # TODO real text ?
 
 
-@helpers('account', 'tournament_id', 'tournament_role')
+@helpers('account', 'tournament_id', 'snapshot', 'tournament_role')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -324,17 +566,21 @@ async def finalize(client, message, **kwargs):
         # only the Challonge role will be able to write in it
         await client.delete_role(message.server, kwargs.get('tournament_role'))
         await client.send_message(message.channel, '✅ Tournament has been finalized!')
+        t_name = t['name']
         try:
-            t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException:
             log_commands_def.exception('')
         else:
-            await update_channel_topic(kwargs.get('account'), t, client, message.channel)
-        await modules.on_state_change(message.server.id, TournamentState.complete, t_name=t['name'], me=message.server.me)
+            await update_channel_topic(t, client, message.channel)
+            backfill_tournament_users(t, message.server)
+            record_tournament_results(t, message.server.id)
+            await send_bracket_image(client, message.channel, t, kwargs.get('snapshot').version)
+        await modules.on_state_change(message.server.id, TournamentState.complete, t_name=t_name, me=message.server.me)
         # TODO real text + show rankings
 
 
-@helpers('account', 'tournament_id', 'tournament_role')
+@helpers('account', 'tournament_id', 'snapshot', 'tournament_role')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -345,7 +591,7 @@ async def destroy(client, message, **kwargs):
     No Arguments
     """
     try:
-        t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'))
+        t = await kwargs.get('snapshot').get()
         await kwargs.get('account').tournaments.destroy(kwargs.get('tournament_id'))
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
@@ -354,53 +600,117 @@ async def destroy(client, message, **kwargs):
             await client.delete_role(message.server, kwargs.get('tournament_role'))
         await client.delete_channel(message.channel)
         channelId = db.get_server(message.server).management_channel_id
-        await client.send_message(discord.Channel(server=message.server, id=channelId), '✅ Tournament {0} has been destroyed by {1}!'.format(t['name'], message.author.mention))
+        await client.send_message(discord.Channel(server=message.server, id=channelId), '✅ Tournament {0} has been destroyed by {1}!'.format(t.name, message.author.mention))
         db.remove_tournament(kwargs.get('tournament_id'))
+        snapshots.prune(kwargs.get('tournament_id'))
+        renders.prune(kwargs.get('tournament_id'))
+        bracket_images.prune(kwargs.get('tournament_id'))
+        scoreboards.forget(message.channel.id)
+        topic_updates.cancel(message.channel.id)
+        applied_topics.pop(message.channel.id, None)
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
-               tournamentState=TournamentStateConstraint.Any)
+               tournamentState=TournamentStateConstraint.Any,
+               readOnly=True)
 async def status(client, message, **kwargs):
     """Get the tournament status
     No Arguments
     """
-    account = kwargs.get('account')
+    snapshot = kwargs.get('snapshot')
     try:
-        t = await account.tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+        t = await snapshot.get()
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
     else:
-        if t['state'] == 'underway':
-            matchesRepr, exc = await get_current_matches_repr(account, t)
-            if exc:
-                await client.send_message(message.channel, exc)
-            else:
-                await client.send_message(message.channel, '✅ Open matches for tournament `{0}` ({1})\n{2}'.format(t['name'], t['full-challonge-url'], matchesRepr))
+        lines = iter_status_lines(t)
+        if snapshot.as_of:
+            lines = itertools.chain([T_StaleSnapshot.format(snapshot.as_of)], lines)
+        await send_paginated(client, message.channel, lines, 'status.txt')
+        await send_bracket_image(client, message.channel, t, snapshot.version)
 
-        elif t['state'] == 'pending':
-            info = []
-            info.append('✅ Tournament: {0} ({1}) is pending.'.format(t['name'], t['full-challonge-url']))
-            info.append('%d participants have registered right now. More can still join until tournament is started' % t['participants-count'])
-            await client.send_message(message.channel, '\n'.join(info))
 
-        elif t['state'] == 'awaiting_review':
-            await client.send_message(message.channel, '✅ Tournament: {0} ({1}) has been completed and is waiting for final review (finalize)'.format(t['name'], t['full-challonge-url']))
+@helpers('account', 'tournament_id', 'snapshot', 'tournament_role')
+@aliases('joinall', 'registerall')
+@optional_args('role')
+@cmds.register(minPermissions=Permissions.Organizer,
+               channelRestrictions=ChannelType.Tournament,
+               challongeAccess=ChallongeAccess.RequiredForHost,
+               tournamentState=TournamentStateConstraint.Pending)
+async def register(client, message, **kwargs):
+    """Register many members at once
+    Optional Arguments:
+    role -- Register every member having this role (mention or name)
+    Members can also be listed after the command, one mention or name per line
+    """
+    role = None
+    if message.role_mentions:
+        role = message.role_mentions[0]
+    elif kwargs.get('role'):
+        role = discord.utils.get(message.server.roles, name=kwargs.get('role').strip('\''))
+        if not role:
+            await client.send_message(message.channel, '❌ I could not find the role %s on this server' % kwargs.get('role'))
+            return
 
-        elif t['state'] == 'complete':
-            rankingRepr, exc = get_final_ranking_repr(account, t)
-            if exc:
-                await client.send_message(message.channel, exc)
-            else:
-                await client.send_message(message.channel, '✅ Tournament: {0} ({1}) has been completed\n{2}'.format(t['name'], t['full-challonge-url'], rankingRepr))
+    members = [m for m in message.server.members if role in m.roles] if role else []
+    unknown = []
+    for line in [l.strip() for l in message.content.splitlines()[1:] if l.strip()]:
+        member = get_member(line, message.server)
+        if member:
+            members.append(member)
+        else:
+            unknown.append(line)
 
+    snapshot = kwargs.get('snapshot')
+    try:
+        t = await snapshot.get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
+        return
+
+    # one registration per member, skipping bots and members already registered
+    to_register = {}
+    for m in members:
+        if not m.bot and not t.participant_named(m.name):
+            to_register.setdefault(m.name, m)
+    if not to_register:
+        await client.send_message(message.channel, '❌ Nobody to register%s' % ('' if not unknown else ' (not found: %s)' % ', '.join(unknown)))
+        return
+
+    names = list(to_register.keys())
+    participants = []
+    for index in range(0, len(names), C_BulkAddChunk):
+        try:
+            participants.extend(await kwargs.get('account').participants.bulk_add(kwargs.get('tournament_id'), names[index:index + C_BulkAddChunk]))
+        except ChallongeException as e:
+            await client.send_message(message.channel, T_OnChallongeException.format(e))
+            break
+
+    joined = [(to_register[p['name']], p['id']) for p in participants if p['name'] in to_register]
+    db.add_tournament_users(kwargs.get('tournament_id'), [(member.id, p_id) for member, p_id in joined])
+    roles_added = await gather_bounded([add_role_safe(client, member, kwargs.get('tournament_role')) for member, _ in joined], C_DiscordConcurrency)
+
+    info = ['✅ %d/%d members registered' % (len(joined), len(names))]
+    if roles_added.count(False):
+        info.append('⚠ The tournament role could not be given to %d of them' % roles_added.count(False))
+    if unknown:
+        info.append('⚠ Not found on this server: %s' % ', '.join(unknown))
+    await client.send_message(message.channel, '\n'.join(info))
+
+    if joined:
+        try:
+            t = await snapshot.refresh()
+        except ChallongeException as e:
+            await client.send_message(message.author, T_OnChallongeException.format(e))
         else:
-            log_commands_def.error('[status] Unknown state: ' + t['state'])
+            await update_channel_topic(t, client, message.channel)
+            await modules.on_event(message.server.id, Events.on_join, p1_name=joined[-1][0].name, t_name=t.name, me=message.server.me)
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @required_args('p1', 'score', 'p2')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
@@ -430,48 +740,153 @@ async def updatex(client, message, **kwargs):
         await client.send_message(message.channel, '❌ I could not find player 2 on this server')
         return
 
-    p1_id, p2_id, exc = await get_players(kwargs.get('account'), kwargs.get('tournament_id'), p1_as_member.name, p2_as_member.name)
-    if exc:
-        await client.send_message(message.channel, exc)
+    try:
+        t = await kwargs.get('snapshot').get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
         return
-    elif not p1_id:
+
+    p1 = get_member_participant(t, p1_as_member)
+    p2 = get_member_participant(t, p2_as_member)
+    if not p1:
         await client.send_message(message.channel, '❌ I could not find player 1 in this tournament')
         return
-    elif not p2_id:
+    elif not p2:
         await client.send_message(message.channel, '❌ I could not find player 2 in this tournament')
         return
+    p1_id, p2_id = p1.id, p2.id
 
-    match, is_reversed, exc = await get_match(kwargs.get('account'), kwargs.get('tournament_id'), p1_id, p2_id)
-    if exc:
-        await client.send_message(message.channel, exc)
-        return
-    elif not match:
+    match, is_reversed = get_match(t, p1_id, p2_id)
+    if not match:
         await client.send_message(message.channel, '❌ No open match found for these players')
         return
 
     winner_id = p1_id if author_is_winner(kwargs.get('score')) else p2_id
     score = kwargs.get('score') if not is_reversed else reverse_score(kwargs.get('score'))
-    msg, exc = await update_score(kwargs.get('account'), kwargs.get('tournament_id'), match['id'], score, winner_id)
+    msg, exc = await update_score(kwargs.get('account'), kwargs.get('tournament_id'), match.id, score, winner_id)
     if exc:
         await client.send_message(message.channel, exc)
         return
     else:
         await client.send_message(message.channel, msg)
+        previous_t = t
         try:
-            t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException:
             log_commands_def.exception('')
         else:
-            await update_channel_topic(kwargs.get('account'), t, client, message.channel)
+            await update_channel_topic(t, client, message.channel)
+            await notify_open_matches(client, message.channel, previous_t, t)
         await modules.on_event(message.server.id, Events.on_update_score, p1_name=p1_as_member.name, score=kwargs.get('score'), p2_name=p2_as_member.name, me=message.server.me)
 
 
-@helpers('account', 'tournament_id')
-@required_args('participant')
+def resolve_report(t, server, line):
+    """Resolves a `p1 score p2` line against the tournament
+    Returns (report, error, retriable), report being (match_id, challonge_score, winner_id, p1_name, score, p2_name)
+    """
+    r = re.match(r'^(.+?)\s+(\d+-\d+(?:,\d+-\d+)*)\s+(.+)$', line)
+    if not r:
+        return None, '❌ Invalid line, expected: p1 5-0,4-5 p2', False
+    p1_name, score, p2_name = r.groups()
+
+    p1_as_member = get_member(p1_name, server)
+    p2_as_member = get_member(p2_name, server)
+    if not p1_as_member or not p2_as_member:
+        return None, '❌ Player %s not found on this server' % (1 if not p1_as_member else 2), False
+
+    p1 = get_member_participant(t, p1_as_member)
+    p2 = get_member_participant(t, p2_as_member)
+    if not p1 or not p2:
+        return None, '❌ Player %s not found in this tournament' % (1 if not p1 else 2), False
+
+    match, is_reversed = get_match(t, p1.id, p2.id)
+    if not match:
+        # may open once another line of the batch has been uploaded
+        return None, '❌ No open match found for these players', True
+
+    winner_id = p1.id if author_is_winner(score) else p2.id
+    return (match.id, reverse_score(score) if is_reversed else score, winner_id, p1_as_member.name, score, p2_as_member.name), None, False
+
+
+@helpers('account', 'tournament_id', 'snapshot')
+@aliases('batch', 'updates')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
                tournamentState=TournamentStateConstraint.Underway)
+async def updatebatch(client, message, **kwargs):
+    """Report many match scores at once
+    One match per line after the command, as for updatex:
+    p1 score p2
+    Matches opened by a line of the batch (next rounds) are reported after it
+    """
+    lines = [l.strip() for l in message.content.splitlines()[1:] if l.strip()]
+    if not lines:
+        await client.send_message(message.channel, '❌ Please put one `p1 score p2` match per line, after the command')
+        return
+
+    snapshot = kwargs.get('snapshot')
+    try:
+        t = await snapshot.get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
+        return
+
+    previous_t = t
+    results = [None] * len(lines)
+    uploaded = []
+    pending = list(range(len(lines)))
+    while pending:
+        # one wave: every line resolvable on the current snapshot, at most once per match
+        wave = []
+        retry = []
+        for index in pending:
+            report, error, retriable = resolve_report(t, message.server, lines[index])
+            if report and report[0] in [r[0] for _, r in wave]:
+                report, error, retriable = None, '❌ Match already reported by another line', True
+            results[index] = error
+            if report:
+                wave.append((index, report))
+            elif retriable:
+                retry.append(index)
+        if not wave:
+            break
+
+        uploads = await gather_bounded([update_score(kwargs.get('account'), kwargs.get('tournament_id'), r[0], r[1], r[2]) for _, r in wave], C_ChallongeConcurrency)
+        for (index, report), (msg, exc) in zip(wave, uploads):
+            results[index] = exc or '✅ Uploaded'
+            if not exc:
+                uploaded.append(report)
+
+        try:
+            t = await snapshot.refresh()
+        except ChallongeException:
+            log_commands_def.exception('')
+            t = None
+            break
+        pending = retry
+
+    a = ArrayFormater('Batch report: %d/%d uploaded' % (len(uploaded), len(lines)), 2)
+    for line, result in zip(lines, results):
+        a.add(line, result)
+    for page in paginate(a.get(), 1800):
+        await client.send_message(message.channel, '```\n' + page + '```')
+
+    if uploaded:
+        if t:
+            await update_channel_topic(t, client, message.channel)
+            await notify_open_matches(client, message.channel, previous_t, t)
+        for _, _, _, p1_name, score, p2_name in uploaded:
+            await modules.on_event(message.server.id, Events.on_update_score, p1_name=p1_name, score=score, p2_name=p2_name, me=message.server.me)
+
+
+@helpers('account', 'tournament_id', 'snapshot')
+@required_args('participant')
+@cmds.register(minPermissions=Permissions.Organizer,
+               channelRestrictions=ChannelType.Tournament,
+               challongeAccess=ChallongeAccess.RequiredForHost,
+               tournamentState=TournamentStateConstraint.Underway,
+               readOnly=True)
 async def nextx(client, message, **kwargs):
     """Get information about your next game
     Required Arguments
@@ -483,38 +898,77 @@ async def nextx(client, message, **kwargs):
         await client.send_message(message.channel, '❌ I could not find the participant on this server')
         return
 
-    msg, exc = await get_next_match(kwargs.get('account'), kwargs.get('tournament_id'), p_as_member.name)
-    if exc:
-        await client.send_message(message.channel, exc)
-    elif msg:
-        await client.send_message(message.channel, msg)
+    snapshot = kwargs.get('snapshot')
+    try:
+        t = await snapshot.get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
     else:
-        await client.send_message(message.channel, '❌ Something went wrong. Sorry...')
+        participant = get_member_participant(t, p_as_member, remember=False)
+        msg = renders.get_or_render(snapshot, ('next', participant.id if participant else None, p_as_member.name),
+                                    lambda: get_next_match(t, participant, p_as_member.name))
+        await client.send_message(message.channel, with_stale_notice(snapshot, msg))
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @aliases('block', 'blocker', 'blockers')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
-               tournamentState=TournamentStateConstraint.Underway)
+               tournamentState=TournamentStateConstraint.Underway,
+               readOnly=True)
 async def blocking(client, message, **kwargs):
     """Get information about games blocking the tournament
     No Arguments
     """
-    msg, exc = await get_blocking_matches(kwargs.get('account'), kwargs.get('tournament_id'))
-    if exc:
-        await client.send_message(message.channel, exc)
-    elif msg:
-        await client.send_message(message.channel, msg)
+    snapshot = kwargs.get('snapshot')
+    try:
+        t = await snapshot.get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
+        return
+
+    msg = renders.get_or_render(snapshot, ('blocking',), lambda: get_blocking_matches(t))
+    if msg:
+        await client.send_message(message.channel, with_stale_notice(snapshot, msg))
     else:
         await client.send_message(message.channel, '❌ Something went wrong. Sorry...')
 
 
+@helpers('account', 'tournament_id', 'snapshot')
+@optional_args('round')
+@cmds.register(minPermissions=Permissions.Participant,
+               channelRestrictions=ChannelType.Tournament,
+               challongeAccess=ChallongeAccess.RequiredForHost,
+               tournamentState=TournamentStateConstraint.Underway,
+               readOnly=True)
+async def eta(client, message, **kwargs):
+    """Get an estimation of when the tournament (or a round) will be over
+    Based on the remaining matches and the duration of the matches played so far
+    Optional Arguments:
+    round -- round number, negative for losers bracket rounds: 3, -2...
+    """
+    round = kwargs.get('round')
+    if round is not None:
+        try:
+            round = int(round)
+        except ValueError:
+            await client.send_message(message.channel, '❌ Invalid round {0}. Please use a round number, negative for losers bracket rounds'.format(round))
+            return
+
+    snapshot = kwargs.get('snapshot')
+    try:
+        t = await snapshot.get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
+    else:
+        await client.send_message(message.channel, with_stale_notice(snapshot, get_eta_repr(t, round)))
+
+
 # PARTICIPANT
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @required_args('score', 'opponent')
 @cmds.register(minPermissions=Permissions.Participant,
                channelRestrictions=ChannelType.Tournament,
@@ -541,55 +995,52 @@ async def update(client, message, **kwargs):
         await client.send_message(message.channel, '❌ I could not find your opponent on this server')
         return
 
-    p1_id, p2_id, exc = await get_players(account, t_id, message.author.name, opponent_as_member.name)
-    if exc:
-        await client.send_message(message.channel, exc)
+    # players and match are resolved from the snapshot fetched during validation
+    try:
+        t = await kwargs.get('snapshot').get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
         return
-    elif not p1_id:
+
+    p1 = get_member_participant(t, message.author)
+    p2 = get_member_participant(t, opponent_as_member)
+    if not p1:
         await client.send_message(message.channel, '❌ I could not find you in this tournament')
         return
-    elif not p2_id:
+    elif not p2:
         await client.send_message(message.channel, '❌ I could not find your opponent in this tournament')
         return
+    p1_id, p2_id = p1.id, p2.id
 
-    match, is_reversed, exc = await get_match(account, t_id, p1_id, p2_id)
-    if exc:
-        await client.send_message(message.channel, exc)
-        return
-    elif not match:
+    match, is_reversed = get_match(t, p1_id, p2_id)
+    if not match:
         await client.send_message(message.channel, '❌ Your current opponent is not ' + opponent_as_member.name)
         return
 
     winner_id = p1_id if author_is_winner(score) else p2_id
     if is_reversed:
         score = reverse_score(score)
-    msg, exc = await update_score(account, t_id, match['id'], score, winner_id)
+    msg, exc = await update_score(account, t_id, match.id, score, winner_id)
     if exc:
         await client.send_message(message.channel, exc)
     else:
-        next_for_p1, exc1 = await get_next_match(account, t_id, message.author.name)
-        next_for_p2, exc2 = await get_next_match(account, t_id, opponent_as_member.name)
-        if exc1 or exc2:
-            # something went wrong with the next games, don't bother the author and send the result msg
-            await client.send_message(message.channel, msg)
-            log_commands_def.error(exc1, exc2)
-        else:
-            if next_for_p1:
-                msg = msg + '\n' + next_for_p1
-            if next_for_p2:
-                msg = msg + '\n' + next_for_p2
-            await client.send_message(message.channel, msg)
-
+        # next matches and topic both come from a single post-update snapshot
+        previous_t = t
         try:
-            t = await account.tournaments.show(t_id, include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException:
+            # something went wrong with the next games, don't bother the author and send the result msg
             log_commands_def.exception('')
+            await client.send_message(message.channel, msg)
         else:
-            await update_channel_topic(account, t, client, message.channel)
+            msg = '\n'.join([msg, get_next_match(t, t.participant(p1_id), message.author.name), get_next_match(t, t.participant(p2_id), opponent_as_member.name)])
+            await client.send_message(message.channel, msg)
+            await update_channel_topic(t, client, message.channel)
+            await notify_open_matches(client, message.channel, previous_t, t)
         await modules.on_event(message.server.id, Events.on_update_score, p1_name=message.author.name, score=kwargs.get('score'), p2_name=opponent_as_member.name, me=message.server.me)
 
 
-@helpers('account', 'tournament_id', 'tournament_role')
+@helpers('account', 'tournament_id', 'snapshot', 'tournament_role')
 @cmds.register(minPermissions=Permissions.Participant,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -601,28 +1052,31 @@ async def forfeit(client, message, **kwargs):
     and you won't be able to write in this channel anymore
     No Arguments
     """
-    author_id, exc = await get_player(kwargs.get('account'), kwargs.get('tournament_id'), message.author.name)
-    if exc:
-        await client.send_message(message.channel, exc)
+    try:
+        author = get_member_participant(await kwargs.get('snapshot').get(), message.author)
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
         return
-    elif author_id:
+    if author:
         try:
-            await kwargs.get('account').participants.destroy(kwargs.get('tournament_id'), author_id)
+            await kwargs.get('account').participants.destroy(kwargs.get('tournament_id'), author.id)
         except ChallongeException as e:
             await client.send_message(message.author, T_OnChallongeException.format(e))
+        else:
+            db.remove_tournament_user(kwargs.get('tournament_id'), message.author.id)
     await client.remove_roles(message.author, kwargs.get('tournament_role'))
     await client.send_message(message.channel, '✅ You forfeited from this tournament')
     try:
-        t = await kwargs.get('account').tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+        t = await kwargs.get('snapshot').refresh()
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
     else:
-        await update_channel_topic(kwargs.get('account'), t, client, message.channel)
-        await modules.on_event(message.server.id, Events.on_forfeit, p1_name=message.author.name, t_name=t['name'], me=message.server.me)
+        await update_channel_topic(t, client, message.channel)
+        await modules.on_event(message.server.id, Events.on_forfeit, p1_name=message.author.name, t_name=t.name, me=message.server.me)
 
 
 @required_args('opponent')
-@helpers('account', 'tournament_id', 'tournament_role')
+@helpers('account', 'tournament_id', 'snapshot', 'tournament_role')
 @cmds.register(minPermissions=Permissions.Organizer,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -635,47 +1089,57 @@ async def forfeitx(client, message, **kwargs):
     No Arguments
     """
     account, t_id, opponent = kwargs.get('account'), kwargs.get('tournament_id'), kwargs.get('opponent')
-    author_id, exc = await get_player(account, t_id, opponent)
-    if exc:
-        await client.send_message(message.channel, exc)
+    member = get_member(opponent, message.server)
+    try:
+        t = await kwargs.get('snapshot').get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
         return
-    elif author_id:
+    participant = get_member_participant(t, member) if member else None
+    author_id = participant.id if participant else get_player(t, opponent)
+    if author_id:
         try:
             await account.participants.destroy(t_id, author_id)
         except ChallongeException as e:
             await client.send_message(message.author, T_OnChallongeException.format(e))
+        else:
+            if member:
+                db.remove_tournament_user(t_id, member.id)
     await client.send_message(message.channel, '✅ {0} has been removed from this tournament'.format(opponent))
-    member = get_member(opponent, message.server)
     if member:
         await client.remove_roles(member, kwargs.get('tournament_role'))
     try:
-        t = await account.tournaments.show(t_id, include_participants=1, include_matches=1)
+        t = await kwargs.get('snapshot').refresh()
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
     else:
-        await update_channel_topic(account, t, client, message.channel)
-        await modules.on_event(message.server.id, Events.on_forfeit, p1_name=opponent, t_name=t['name'], me=message.server.me)
+        await update_channel_topic(t, client, message.channel)
+        await modules.on_event(message.server.id, Events.on_forfeit, p1_name=opponent, t_name=t.name, me=message.server.me)
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Participant,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
-               tournamentState=TournamentStateConstraint.Underway)
+               tournamentState=TournamentStateConstraint.Underway,
+               readOnly=True)
 async def next(client, message, **kwargs):
     """Get information about your next game
     No Arguments
     """
-    msg, exc = await get_next_match(kwargs.get('account'), kwargs.get('tournament_id'), message.author.name)
-    if exc:
-        await client.send_message(message.channel, exc)
-    elif msg:
-        await client.send_message(message.channel, msg)
+    snapshot = kwargs.get('snapshot')
+    try:
+        t = await snapshot.get()
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
     else:
-        await client.send_message(message.channel, '❌ Something went wrong. Sorry...')
+        participant = get_member_participant(t, message.author, remember=False)
+        msg = renders.get_or_render(snapshot, ('next', participant.id if participant else None, message.author.name),
+                                    lambda: get_next_match(t, participant, message.author.name))
+        await client.send_message(message.channel, with_stale_notice(snapshot, msg))
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Participant,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -684,20 +1148,21 @@ async def checkin(client, message, **kwargs):
     """Check-in for the current tournament
     No Arguments
     """
-    author_id, exc = await get_player(kwargs.get('account'), kwargs.get('tournament_id'), message.author.name)
-    if exc:
-        await client.send_message(message.channel, exc)
+    try:
+        author = get_member_participant(await kwargs.get('snapshot').get(), message.author)
+    except ChallongeException as e:
+        await client.send_message(message.channel, T_OnChallongeException.format(e))
         return
-    elif author_id:
+    if author:
         try:
-            await kwargs.get('account').participants.check_in(kwargs.get('tournament_id'), author_id)
+            await kwargs.get('account').participants.check_in(kwargs.get('tournament_id'), author.id)
         except ChallongeException as e:
             await client.send_message(message.author, T_OnChallongeException.format(e))
         else:
             await client.send_message(message.channel, '✅ You have successfully checked in. Please wait for the organizers to start the tournament')
 
 
-@helpers('account', 'tournament_id')
+@helpers('account', 'tournament_id', 'snapshot')
 @cmds.register(minPermissions=Permissions.Participant,
                channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
@@ -707,11 +1172,9 @@ async def undocheckin(client, message, **kwargs):
     No Arguments
     """
     try:
-        participants = await kwargs.get('account').participants.index(kwargs.get('tournament_id'))
-        for x in participants:
-            if x['name'] == message.author.name:
-                await kwargs.get('account').participants.undo_check_in(kwargs.get('tournament_id'), x['id'])
-                break
+        author = get_member_participant(await kwargs.get('snapshot').get(), message.author)
+        if author:
+            await kwargs.get('account').participants.undo_check_in(kwargs.get('tournament_id'), author.id)
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
     else:
@@ -750,7 +1213,7 @@ async def key(client, message, **kwargs):
             await client.send_message(message.author, '✅ Thanks, your key has been removed from our server!')
 
 
-@helpers('account', 'tournament_id', 'participant_username', 'tournament_role')
+@helpers('account', 'tournament_id', 'snapshot', 'participant_username', 'tournament_role')
 @cmds.register(channelRestrictions=ChannelType.Tournament,
                challongeAccess=ChallongeAccess.RequiredForHost,
                tournamentState=TournamentStateConstraint.Pending)
@@ -760,17 +1223,18 @@ async def join(client, message, **kwargs):
     """
     account = kwargs.get('account')
     try:
-        await account.participants.create(kwargs.get('tournament_id'), message.author.name, challonge_username=kwargs.get('participant_username'))
+        participant = await account.participants.create(kwargs.get('tournament_id'), message.author.name, challonge_username=kwargs.get('participant_username'))
     except ChallongeException as e:
         await client.send_message(message.author, T_OnChallongeException.format(e))
     else:
+        db.add_tournament_user(kwargs.get('tournament_id'), message.author.id, participant['id'])
         await client.add_roles(message.author, kwargs.get('tournament_role'))
         await client.send_message(message.channel, '✅ You have successfully joined the tournament')
         try:
-            t = await account.tournaments.show(kwargs.get('tournament_id'), include_participants=1, include_matches=1)
+            t = await kwargs.get('snapshot').refresh()
         except ChallongeException as e:
             await client.send_message(message.author, T_OnChallongeException.format(e))
         else:
-            await update_channel_topic(account, t, client, message.channel)
-            await modules.on_event(message.server.id, Events.on_join, p1_name=message.author.name, t_name=t['name'], me=message.server.me)
+            await update_channel_topic(t, client, message.channel)
+            await modules.on_event(message.server.id, Events.on_join, p1_name=message.author.name, t_name=t.name, me=message.server.me)
         # TODO more info
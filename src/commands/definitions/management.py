@@ -7,11 +7,11 @@ from const import C_RoleName, T_Info, T_PromoteError, T_DemoteError, T_HelpGloba
 from discord_impl.permissions import Permissions
 from discord_impl.channel_type import ChannelType
 from database.core import db
-from commands.core import cmds, required_args, optional_args, AuthorizedCommandsWrapper, MissingParameters
+from commands.core import cmds, aliases, required_args, optional_args, AuthorizedCommandsWrapper, MissingParameters
 from modules.core import modules
 from log import log_commands_def
 
-from utils import get_user_id_from_mention
+from utils import get_user_id_from_mention, ArrayFormater
 
 # SERVER OWNER
 
@@ -147,6 +147,33 @@ async def help(client, message, **kwargs):
         await client.send_message(message.channel, T_HelpGlobal.format('\n  '.join(commandsStr)))
 
 
+@optional_args('count')
+@aliases('ranking', 'elo')
+@cmds.register(channelRestrictions=ChannelType.Any)
+async def leaderboard(client, message, **kwargs):
+    """Get the best rated players of this server
+    Ratings are updated with the results of every tournament finalized on this server
+    Optional Argument:
+    count -- how many players to show (10 by default, 50 max)
+    """
+    if message.channel.is_private:
+        await client.send_message(message.channel, '❌ Leaderboards are only available on servers')
+        return
+    count = kwargs.get('count')
+    count = min(int(count), 50) if count and count.isdigit() else 10
+
+    ratings = db.get_leaderboard(message.server.id, count)
+    if not ratings:
+        await client.send_message(message.channel, '✅ No finalized tournament on this server yet')
+        return
+    a = ArrayFormater('Leaderboard', 4)
+    a.add('#', 'Player', 'Rating', 'Matches')
+    for rank, r in enumerate(ratings):
+        member = message.server.get_member(r.discord_id)
+        a.add(str(rank + 1), member.name if member else r.discord_id, '%d' % round(float(r.rating)), str(r.matches))
+    await client.send_message(message.channel, '```\n' + a.get() + '```')
+
+
 @cmds.register(channelRestrictions=ChannelType.Any)
 async def info(client, message, **kwArgs):
     """Get info about the Challonge Bot
@@ -7,7 +7,8 @@ keys = ['heroku',
         'discord_token',
         'cryptokey',
         'database',
-        'whitelistedbots']
+        'whitelistedbots',
+        'challonge_api_url']
 
 if os.getenv('heroku'):
     for k in keys:
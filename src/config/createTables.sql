@@ -38,5 +38,38 @@ CREATE TABLE "Modules" (
     "ModuleDef" TEXT NOT NULL,
     UNIQUE(ServerID, ModuleName)
 );
+CREATE TABLE "challonge_tournament_users" (
+    "tournament_id" TEXT NOT NULL,
+    "discord_id" TEXT NOT NULL,
+    "participant_id" TEXT,
+    UNIQUE(tournament_id, discord_id),
+    UNIQUE(tournament_id, participant_id)
+);
+CREATE TABLE "challonge_snapshots" (
+    "tournament_id" TEXT NOT NULL UNIQUE,
+    "version" INTEGER NOT NULL,
+    "fetched_at" TEXT NOT NULL,
+    "data" BYTEA NOT NULL,
+    PRIMARY KEY(tournament_id)
+);
+CREATE TABLE "challonge_match_history" (
+    "server_id" TEXT NOT NULL,
+    "tournament_id" TEXT NOT NULL,
+    "match_id" TEXT NOT NULL,
+    "winner_id" TEXT NOT NULL,
+    "loser_id" TEXT NOT NULL,
+    "scores_csv" TEXT,
+    "completed_at" TEXT,
+    UNIQUE(tournament_id, match_id)
+);
+CREATE INDEX "challonge_match_history_server_tournament" ON "challonge_match_history" ("server_id", "tournament_id");
+CREATE TABLE "challonge_ratings" (
+    "server_id" TEXT NOT NULL,
+    "discord_id" TEXT NOT NULL,
+    "rating" REAL NOT NULL,
+    "matches" INTEGER NOT NULL,
+    PRIMARY KEY(server_id, discord_id)
+);
+CREATE INDEX "challonge_ratings_leaderboard" ON "challonge_ratings" ("server_id", "rating" DESC);
 
 COMMIT;
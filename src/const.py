@@ -2,6 +2,19 @@ from inspect import cleandoc
 
 C_ManagementChannelName = 'ChallongeManagement'
 C_RoleName = 'Challonge'
+C_ChallongeConcurrency = 4  # requests in flight at once for bulk operations
+C_ChallongeTimeout = 10  # seconds a light Challonge request may take before it counts as failed
+C_DiscordConcurrency = 5
+C_BulkAddChunk = 50  # participants per Challonge bulk_add request
+C_MessageMaxLength = 2000
+C_MaxPages = 5  # longer outputs are sent as a text file
+C_AttachmentMaxBytes = 8 * 1024 * 1024
+C_TopicUpdateDelay = 10  # seconds during which topic updates of a channel are coalesced
+C_NotificationBatch = 5  # direct messages sent at once
+C_NotificationInterval = 1.0  # seconds between two batches of direct messages
+C_BracketImagesDir = 'data/brackets'
+C_BracketImagesMemoryBytes = 16 * 1024 * 1024
+C_BracketImagesDiskBytes = 256 * 1024 * 1024
 
 T_JoinServer_Header = 'Thanks for installing the Challonge Bot on server \'*{0}*\'\n'
 T_JoinServer_NeedKey = cleandoc("""Your challonge username is already registered (\'{}\'), but your API key is needed as well
@@ -37,10 +50,23 @@ T_TournamentCreated = cleandoc("""✅ Tournament **{0}** has been successfully c
     The channel {3} has been created to centralize all discussion about this tournament
     Have Fun!""")
 
+T_InvalidTournamentType = '❌ Invalid tournament type {}. Please choose from singleelim, doubleelim, roundrobin or swiss'
+
 T_OnChallongeException = cleandoc("""❌ Something happened during the Challonge request! Sorry, your command will fail...
     Here is the feedback from Challonge:
     ```{}```""")
 
+T_MatchReady_DM = '🔔 Your match against **{0}** is ready in tournament **{1}** ({2})'
+T_MatchReady_Channel = '🔔 These matches are ready to be played:'
+
+T_Scoreboard = '📊 **Live scoreboard**'
+
+T_DiscordErrors = '❌ Some Discord operations failed: {0}'
+
+T_SentAsFile = '📄 This is too long for Discord messages, here it is as a file'
+
+T_StaleSnapshot = '⚠ Challonge is not responding, this is the tournament as of {0:%H:%M} UTC'
+
 T_PromoteError = cleandoc("""❌ Could not promote Member **{0.name}** because of insufficient permissions.
     {1} could you add Role 'Challonge' to this member? Thanks!""")
 T_DemoteError = cleandoc("""❌ Could not demote Member **{0.name}** because of insufficient permissions.
@@ -1,6 +1,6 @@
 from config import app_config
 from log import log_db
-from database.models import DBServer, DBTournament, DBUser, DBModule
+from database.models import DBServer, DBTournament, DBUser, DBModule, DBTournamentUser, DBSnapshot, DBMatchHistory, DBRating
 if 'heroku' in app_config:
     import psycopg2
     from urllib.parse import urlparse
@@ -70,19 +70,32 @@ class DBAccess():
         except psycopg2.Error as e:
             log_db.error(e.pgerror)
 
+    def _insert_many(self, table, columns, values_list, commit=True):
+        request = 'INSERT INTO {0} ({1}) VALUES ({2});'.format(str(table), ', '.join(columns), ', '.join([self._token] * len(columns)))
+        log_db.debug((request, values_list))
+        try:
+            self._c.executemany(request, values_list)
+            if commit:
+                self._conn.commit()
+        except psycopg2.Error as e:
+            log_db.error(e.pgerror)
+
+    def _where(self, columns):
+        return ' AND '.join(['{0} = {1}'.format(c, self._token) for c in to_list(columns)])
+
     def _delete(self, table, column, value):
-        request = 'DELETE FROM {0} WHERE {1} = {2};'.format(str(table), column, self._token)
+        request = 'DELETE FROM {0} WHERE {1};'.format(str(table), self._where(column))
         log_db.debug((request, value))
-        self._c.execute(request, (value,))
+        self._c.execute(request, tuple(to_list(value)))
         self._conn.commit()
 
     def _select(self, table, columns, where_column=None, where_value=None):
         request = 'SELECT {0} FROM {1}'.format(', '.join(to_list(columns)), str(table))
         try:
             if where_column:
-                request = request + ' WHERE {0} = {1};'.format(where_column, self._token)
+                request = request + ' WHERE {0};'.format(self._where(where_column))
                 log_db.debug((request, where_value))
-                self._c.execute(request, (where_value,))
+                self._c.execute(request, tuple(to_list(where_value)))
             else:
                 request += ';'
                 log_db.debug(request)
@@ -138,8 +151,23 @@ class DBAccess():
     def add_tournament(self, challonge_id, channel, role_id, host_id):
         self._insert(table=DBTournament, columns=DBTournament.columns, values=(challonge_id, channel.server.id, channel.id, role_id, host_id))
 
+    def add_tournaments(self, tournaments, users):
+        """tournaments: iterable of (challonge_id, channel, role_id, host_id)
+        users: iterable of (challonge_id, discord_id, participant_id)
+        Both are inserted in one transaction
+        """
+        self._insert_many(table=DBTournament, columns=DBTournament.columns,
+                          values_list=[(challonge_id, channel.server.id, channel.id, role_id, host_id) for challonge_id, channel, role_id, host_id in tournaments],
+                          commit=False)
+        users = list(users)
+        if users:
+            self._insert_many(table=DBTournamentUser, columns=DBTournamentUser.columns, values_list=users, commit=False)
+        self._conn.commit()
+
     def remove_tournament(self, challonge_id):
         self._delete(table=DBTournament, column=DBTournament.challonge_id, value=challonge_id)
+        self._delete(table=DBTournamentUser, column=DBTournamentUser.tournament_id, value=challonge_id)
+        self._delete(table=DBSnapshot, column=DBSnapshot.tournament_id, value=challonge_id)
 
     def remove_all_tournaments(self, server):
         self._delete(table=DBTournament, column=DBTournament.server_id, value=server.id)
@@ -153,6 +181,54 @@ class DBAccess():
         for x in cur:
             yield DBTournament(x)
 
+    # Tournament users (Discord member <-> Challonge participant)
+
+    def add_tournament_user(self, challonge_id, discord_id, participant_id):
+        self.remove_tournament_user(challonge_id, discord_id)
+        self._insert(table=DBTournamentUser, columns=DBTournamentUser.columns, values=(challonge_id, discord_id, str(participant_id)))
+
+    def add_tournament_users(self, challonge_id, users):
+        """users: iterable of (discord_id, participant_id) not mapped yet, inserted in one transaction"""
+        values_list = [(challonge_id, discord_id, str(participant_id)) for discord_id, participant_id in users]
+        if values_list:
+            self._insert_many(table=DBTournamentUser, columns=DBTournamentUser.columns, values_list=values_list)
+
+    def remove_tournament_user(self, challonge_id, discord_id):
+        self._delete(table=DBTournamentUser,
+                     column=[DBTournamentUser.tournament_id, DBTournamentUser.discord_id],
+                     value=[challonge_id, discord_id])
+
+    def get_participant_id(self, challonge_id, discord_id):
+        cur = self._select(table=DBTournamentUser, columns=DBTournamentUser.participant_id,
+                           where_column=[DBTournamentUser.tournament_id, DBTournamentUser.discord_id],
+                           where_value=[challonge_id, discord_id])
+        row = cur.fetchone() if cur else None
+        return int(row[0]) if row and row[0] is not None else None
+
+    def get_participant_discord_id(self, challonge_id, participant_id):
+        cur = self._select(table=DBTournamentUser, columns=DBTournamentUser.discord_id,
+                           where_column=[DBTournamentUser.tournament_id, DBTournamentUser.participant_id],
+                           where_value=[challonge_id, str(participant_id)])
+        row = cur.fetchone() if cur else None
+        return row[0] if row else None
+
+    def get_tournament_users(self, challonge_id):
+        cur = self._select(table=DBTournamentUser, columns='*', where_column=DBTournamentUser.tournament_id, where_value=challonge_id)
+        return [DBTournamentUser(x) for x in cur]
+
+    # Tournament snapshots
+
+    def set_snapshot(self, challonge_id, version, fetched_at, data):
+        self.remove_snapshot(challonge_id)
+        self._insert(table=DBSnapshot, columns=DBSnapshot.columns, values=(challonge_id, version, fetched_at, data))
+
+    def get_snapshot(self, challonge_id):
+        cur = self._select(table=DBSnapshot, columns='*', where_column=DBSnapshot.tournament_id, where_value=challonge_id)
+        return DBSnapshot(cur.fetchone() if cur else None)
+
+    def remove_snapshot(self, challonge_id):
+        self._delete(table=DBSnapshot, column=DBSnapshot.tournament_id, value=challonge_id)
+
     # Users
 
     def add_user(self, user):
@@ -177,6 +253,45 @@ class DBAccess():
         cur = self._select(table=DBUser, columns='*')
         return [DBUser(x) for x in cur]
 
+    # Match history and ratings
+
+    def has_match_history(self, challonge_id):
+        cur = self._select(table=DBMatchHistory, columns=DBMatchHistory.match_id, where_column=DBMatchHistory.tournament_id, where_value=challonge_id)
+        return cur.fetchone() is not None if cur else False
+
+    def get_ratings(self, server_id, discord_ids):
+        """{discord_id: DBRating} of those of the members who already have a rating"""
+        discord_ids = list(discord_ids)
+        if not discord_ids:
+            return {}
+        request = 'SELECT * FROM {0} WHERE {1} = {3} AND {2} IN ({4});'.format(str(DBRating), DBRating.server_id, DBRating.discord_id,
+                                                                             self._token, ', '.join([self._token] * len(discord_ids)))
+        log_db.debug((request, server_id, discord_ids))
+        self._c.execute(request, tuple([server_id] + discord_ids))
+        return {x[1]: DBRating(x) for x in self._c.fetchall()}
+
+    def add_tournament_results(self, server_id, challonge_id, matches, ratings):
+        """matches: iterable of (match_id, winner_id, loser_id, scores_csv, completed_at), players as discord ids
+        ratings: {discord_id: (rating, matches)} updated by these matches
+        Both are recorded in one transaction
+        """
+        self._insert_many(table=DBMatchHistory, columns=DBMatchHistory.columns,
+                          values_list=[(server_id, challonge_id) + tuple(m) for m in matches],
+                          commit=False)
+        if ratings:
+            request = 'DELETE FROM {0} WHERE {1};'.format(str(DBRating), self._where([DBRating.server_id, DBRating.discord_id]))
+            self._c.executemany(request, [(server_id, discord_id) for discord_id in ratings])
+            self._insert_many(table=DBRating, columns=DBRating.columns,
+                              values_list=[(server_id, discord_id, rating, count) for discord_id, (rating, count) in ratings.items()],
+                              commit=False)
+        self._conn.commit()
+
+    def get_leaderboard(self, server_id, limit):
+        request = 'SELECT * FROM {0} WHERE {1} = {2} ORDER BY {3} DESC LIMIT {4};'.format(str(DBRating), DBRating.server_id, self._token, DBRating.rating, int(limit))
+        log_db.debug((request, server_id))
+        self._c.execute(request, (server_id,))
+        return [DBRating(x) for x in self._c.fetchall()]
+
     # Modules
 
     def add_module(self, server_id, name, module_def):
@@ -16,6 +16,30 @@ class DBTournament(metaclass=DBModel,
     pass
 
 
+class DBTournamentUser(metaclass=DBModel,
+                       table_name='challonge_tournament_users',
+                       metaattr=['tournament_id', 'discord_id', 'participant_id']):
+    pass
+
+
+class DBSnapshot(metaclass=DBModel,
+                 table_name='challonge_snapshots',
+                 metaattr=['tournament_id', 'version', 'fetched_at', 'data']):
+    pass
+
+
+class DBMatchHistory(metaclass=DBModel,
+                     table_name='challonge_match_history',
+                     metaattr=['server_id', 'tournament_id', 'match_id', 'winner_id', 'loser_id', 'scores_csv', 'completed_at']):
+    pass
+
+
+class DBRating(metaclass=DBModel,
+               table_name='challonge_ratings',
+               metaattr=['server_id', 'discord_id', 'rating', 'matches']):
+    pass
+
+
 class DBUser(metaclass=DBModel,
              table_name='challonge_users',
              metaattr=['discord_id', 'challonge_user_name', 'api_key']):
@@ -0,0 +1,179 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from enum import Enum
+
+import discord
+
+from const import C_MessageMaxLength
+
+
+class Priority(Enum):
+    Reply = 0  # answers to a command: sent first
+    Notice = 1  # background notifications, scoreboards, topics...
+
+
+route_limits = {  # route -> (requests, per seconds, ordered), for each channel / server
+    'messages': (5, 5.0, True),
+    'edit_message': (5, 5.0, True),
+    'pins': (5, 5.0, True),
+    'channel': (2, 10.0, True),
+    'permissions': (5, 5.0, False),
+    'roles': (10, 10.0, False),
+}
+global_limit = (50, 1.0)
+merge_max_length = 400  # only messages shorter than this are merged with the next ones
+
+
+class _Window:
+    """Sliding window of the last calls"""
+    def __init__(self, limit, per):
+        self._limit = limit
+        self._per = per
+        self._calls = deque()
+
+    def delay(self):
+        """Seconds to wait before the next call"""
+        now = time.time()
+        while self._calls and now - self._calls[0] >= self._per:
+            self._calls.popleft()
+        if len(self._calls) < self._limit:
+            return 0
+        return self._per - (now - self._calls[0])
+
+    def add(self):
+        self._calls.append(time.time())
+
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'func', 'args', 'kwargs', 'text', 'future', 'enqueued_at')
+
+    def __init__(self, priority, seq, func, args, kwargs, text, future):
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.text = text  # content of a message that can be merged, None otherwise
+        self.future = future
+        self.enqueued_at = time.time()
+
+    def __lt__(self, other):
+        return (self.priority.value, self.seq) < (other.priority.value, other.seq)
+
+
+class _Bucket:
+    def __init__(self, route):
+        limit, per, ordered = route_limits[route]
+        self.window = _Window(limit, per)
+        self.ordered = ordered  # calls made one after the other, otherwise concurrently within the limits
+        self.heap = []
+        self.draining = False
+        self.requests = 0  # requests made by the bot code
+        self.calls = 0  # calls made to Discord
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class QueuedClient(discord.Client):
+    """Client whose outbound requests are queued per route and channel (or server)
+
+    Each bucket is drained in order of priority (replies before notices), within the known
+    Discord limits of its route and the global one, so that bursts wait in the queue instead of
+    hitting rate limits. Calls are made one after the other where order matters (messages, edits),
+    concurrently otherwise. Short messages waiting for the same channel are sent as a single one.
+    Callers still await the result of their request, as with discord.Client
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buckets = {}  # (route, channel or server id) -> _Bucket
+        self._global = _Window(*global_limit)
+        self._seq = itertools.count()
+
+    def _enqueue(self, route, major_id, func, args, kwargs, priority, text=None):
+        key = (route, major_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(route)
+        future = self.loop.create_future()
+        heapq.heappush(bucket.heap, _Request(priority, next(self._seq), func, args, kwargs, text, future))
+        if not bucket.draining:
+            bucket.draining = True
+            self.loop.create_task(self._drain(bucket))
+        return future
+
+    async def _drain(self, bucket):
+        try:
+            while bucket.heap:
+                delay = max(bucket.window.delay(), self._global.delay())
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                requests = [heapq.heappop(bucket.heap)]
+                if requests[0].text is not None:
+                    length = len(requests[0].text)
+                    while bucket.heap and bucket.heap[0].text is not None and length + 1 + len(bucket.heap[0].text) <= C_MessageMaxLength:
+                        requests.append(heapq.heappop(bucket.heap))
+                        length += 1 + len(requests[-1].text)
+
+                bucket.window.add()
+                self._global.add()
+                now = time.time()
+                bucket.calls += 1
+                bucket.requests += len(requests)
+                for r in requests:
+                    bucket.wait_total += now - r.enqueued_at
+                    bucket.wait_max = max(bucket.wait_max, now - r.enqueued_at)
+
+                if bucket.ordered:
+                    await self._call(requests)
+                else:
+                    self.loop.create_task(self._call(requests))
+        finally:
+            bucket.draining = False
+
+    async def _call(self, requests):
+        first = requests[0]
+        args = first.args if len(requests) == 1 else (first.args[0], '\n'.join(r.text for r in requests))
+        try:
+            result = await first.func(*args, **first.kwargs)
+        except Exception as e:
+            for r in requests:
+                if not r.future.done():
+                    r.future.set_exception(e)
+        else:
+            for r in requests:
+                if not r.future.done():
+                    r.future.set_result(result)
+
+    def queue_metrics(self):
+        """(route, id, depth, requests, calls, average wait, max wait) of every bucket used so far"""
+        for (route, major_id), b in sorted(self._buckets.items()):
+            yield route, major_id, len(b.heap), b.requests, b.calls, b.wait_total / b.requests if b.requests else 0.0, b.wait_max
+
+    def send_message(self, destination, content=None, *, tts=False, embed=None, priority=Priority.Reply, merge=True):
+        if content is not None:
+            content = str(content)  # such as the exceptions replied by failed validations
+        text = content if merge and content and not tts and embed is None and len(content) < merge_max_length else None
+        return self._enqueue('messages', destination.id, super().send_message, (destination, content), {'tts': tts, 'embed': embed}, priority, text)
+
+    def send_file(self, destination, fp, *, filename=None, content=None, tts=False, priority=Priority.Reply):
+        return self._enqueue('messages', destination.id, super().send_file, (destination, fp), {'filename': filename, 'content': content, 'tts': tts}, priority)
+
+    def edit_message(self, message, new_content=None, *, embed=None, priority=Priority.Reply):
+        return self._enqueue('edit_message', message.channel.id, super().edit_message, (message, new_content), {'embed': embed}, priority)
+
+    def pin_message(self, message, *, priority=Priority.Reply):
+        return self._enqueue('pins', message.channel.id, super().pin_message, (message,), {}, priority)
+
+    def edit_channel(self, channel, *, priority=Priority.Reply, **options):
+        return self._enqueue('channel', channel.id, super().edit_channel, (channel,), options, priority)
+
+    def edit_channel_permissions(self, channel, target, overwrite=None, *, priority=Priority.Reply):
+        return self._enqueue('permissions', channel.id, super().edit_channel_permissions, (channel, target, overwrite), {}, priority)
+
+    def add_roles(self, member, *roles, priority=Priority.Reply):
+        return self._enqueue('roles', member.server.id, super().add_roles, (member,) + roles, {}, priority)
@@ -6,16 +6,19 @@ from const import (C_RoleName,
                    T_JoinServer_SetupDone, C_ManagementChannelName)
 from config import app_config
 from log import log_main
+from utils import gather_all
 from profiling import profile_async, Scope
 from commands.core import cmds
 from database.core import db
 from modules.core import modules
+from challonge_impl.poller import poller
+from discord_impl.client import QueuedClient
 
 
 log_main.debug('app_start')
 
 
-client = discord.Client()
+client = QueuedClient()
 
 
 @profile_async(Scope.Core)
@@ -53,6 +56,7 @@ async def on_ready_impl():
         await cleanup_removed_server(sid)
 
     await modules.set_client(client)
+    poller.start(client)
 
     # Should we do a sanity check?
 
@@ -64,30 +68,28 @@ async def on_ready():
 
 @profile_async(Scope.Core)
 async def on_challonge_role_assigned(server, chRole):
-    try:
-        await client.move_role(server, chRole, 1)
-    except discord.errors.HTTPException:
-        pass
-
-    # now create a channel
-    chChannel = await client.create_channel(server, C_ManagementChannelName)
+    # moving the role may fail without consequences: only the channel is needed
+    (_, chChannel), errors = await gather_all(client.move_role(server, chRole, 1),
+                                              client.create_channel(server, C_ManagementChannelName))
+    for e in errors:
+        log_main.info('on_challonge_role_assigned [Server \'{0}\'] {1}'.format(server.name, e))
+    if not chChannel:
+        return
 
     db.add_server(server, chChannel)
 
-    overwrite = discord.PermissionOverwrite()
-    overwrite.send_messages = False
-    overwrite.read_messages = False
-    await client.edit_channel_permissions(chChannel, server.default_role, overwrite)
-
-    overwrite = discord.PermissionOverwrite()
-    overwrite.send_messages = True
-    overwrite.read_messages = True
-    overwrite.manage_messages = True
-    overwrite.embed_links = True
-    overwrite.attach_files = True
-    overwrite.read_message_history = True
-    overwrite.manage_channel = True
-    await client.edit_channel_permissions(chChannel, chRole, overwrite)
+    denied = discord.PermissionOverwrite()
+    denied.send_messages = False
+    denied.read_messages = False
+
+    allowed = discord.PermissionOverwrite()
+    allowed.send_messages = True
+    allowed.read_messages = True
+    allowed.manage_messages = True
+    allowed.embed_links = True
+    allowed.attach_files = True
+    allowed.read_message_history = True
+    allowed.manage_channel = True
 
     # notify owner
     owner = db.get_user(server.owner.id)
@@ -105,7 +107,11 @@ async def on_challonge_role_assigned(server, chRole):
 
     header = T_JoinServer_Header.format(server.name)
     footer = T_JoinServer_SetupDone
-    await client.send_message(server.owner, header + msg + '\n' + footer)
+    _, errors = await gather_all(client.edit_channel_permissions(chChannel, server.default_role, denied),
+                                 client.edit_channel_permissions(chChannel, chRole, allowed),
+                                 client.send_message(server.owner, header + msg + '\n' + footer))
+    for e in errors:
+        log_main.error('on_challonge_role_assigned [Server \'{0}\'] {1}'.format(server.name, e))
 
 
 @client.event
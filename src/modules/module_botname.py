@@ -3,6 +3,7 @@ import asyncio
 from database.core import db
 from challonge_impl.accounts import ChallongeException, get as get_account
 from challonge_impl.utils import TournamentState
+from challonge_impl.snapshot import snapshots, TournamentSnapshot
 from modules.base import Module, Template
 from log import log_modules
 
@@ -30,18 +31,23 @@ class Module_BotName(Module):
         await self._client.change_nickname(me, None)
 
     async def post_init(self):
-        for db_t in db.get_tournaments(self._server_id):
-            account, exc = await get_account(db_t.host_id)
-            if not exc:
+        for db_t in list(db.get_tournaments(self._server_id)):  # the store queries the db while iterating
+            # the last known snapshot survives restarts: only ask Challonge when there is none
+            t, _ = snapshots.get(db_t.challonge_id)
+            if t is None:
+                account, exc = await get_account(db_t.host_id)
+                if exc:
+                    log_modules.error('Exception in Module_BotName._init_tournaments: %s' % exc)
+                    continue
                 try:
-                    t = await account.tournaments.show(db_t.challonge_id)
+                    await TournamentSnapshot(account, db_t.challonge_id).get()  # fills the store
                 except ChallongeException:
                     log_modules.exception('')
+                    continue
+                t, _ = snapshots.get(db_t.challonge_id)
 
-                if t['state'] in TournamentState.__members__.keys():
-                    await self.on_state_change(TournamentState[t['state']], t_name=t['name'])
-            else:
-                log_modules.error('Exception in Module_BotName._init_tournaments: %s' % exc)
+            if t['state'] in TournamentState.__members__.keys():
+                await self.on_state_change(TournamentState[t['state']], t_name=t['name'])
 
     async def _revert_to_default_in(self, time):
         await asyncio.sleep(time)
@@ -0,0 +1,86 @@
+"""Synthetic Challonge tournaments for tests and benchmarks
+
+Tournaments are played out by the stand-in state, so that prerequisite matches, states
+and scores are consistent with what Challonge would serve. Running this module benchmarks
+the bracket helpers on generated tournaments:
+
+    python -m standin.generator
+"""
+import random
+import time
+
+from standin.state import StandInState
+
+
+def _random_score(rng, player1_wins):
+    loser_games = rng.randint(0, 1)
+    return '2-%d' % loser_games if player1_wins else '%d-2' % loser_games
+
+
+def generate_tournament(tournament_type='single elimination', players=16, progress=0.0, finalize=False, seed=None, upset_rate=0.3):
+    """Challonge-shaped payload of a tournament, with participants and matches included
+
+    progress: None for a pending tournament, otherwise the fraction of its matches already played
+    (all of them for 1.0, which leaves the tournament awaiting review, or complete with `finalize`)
+    Open matches are played in random order and the better seed loses with probability `upset_rate`,
+    reproducibly for a given `seed`.
+    Beware that round robins grow quadratically: 4096 players means more than 8 million matches
+    """
+    rng = random.Random(seed)
+    state = StandInState()
+    t = state.create_tournament({'name': 'Synthetic %s %s' % (tournament_type, players), 'tournament_type': tournament_type})
+    t_key = str(t['id'])
+    state.bulk_add_participants(t_key, [{'name': 'Player%04d' % (i + 1)} for i in range(players)])
+    if progress is None:
+        return state.show_tournament(t_key, include_participants=True, include_matches=True)
+
+    state.start_tournament(t_key)
+    if tournament_type == 'swiss':
+        total = state.swiss_rounds(t) * (players // 2)
+    else:
+        total = len(state.matches[t['id']])
+    target = round(total * min(progress, 1.0))
+
+    seeds = {p['id']: p['seed'] for p in state.participants[t['id']]}
+    open_matches = [m for m in state.matches[t['id']] if m['state'] == 'open']
+    played = 0
+    while played < target and open_matches:
+        index = rng.randrange(len(open_matches))
+        open_matches[index], open_matches[-1] = open_matches[-1], open_matches[index]
+        m = open_matches.pop()
+        player1_favorite = seeds[m['player1-id']] < seeds[m['player2-id']]
+        player1_wins = player1_favorite != (rng.random() < upset_rate)
+        winner_id = m['player1-id'] if player1_wins else m['player2-id']
+        open_matches.extend(state.complete_match(t, m, winner_id, _random_score(rng, player1_wins)))
+        played += 1
+
+    if finalize and t['state'] == 'awaiting_review':
+        state.finalize_tournament(t_key)
+    return state.show_tournament(t_key, include_participants=True, include_matches=True)
+
+
+def _benchmark(name, func, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    print('  %-28s %8.2f ms' % (name, (time.perf_counter() - start) * 1000 / repeat))
+
+
+if __name__ == '__main__':
+    from challonge_impl.bracket import Tournament
+    from challonge_impl.standings import compute_standings
+    from challonge_impl.utils import get_blocking_matches, get_current_matches_repr, get_next_match
+
+    for tournament_type, players in [('single elimination', 4096), ('double elimination', 1024), ('double elimination', 4096),
+                                     ('swiss', 4096), ('round robin', 256)]:
+        start = time.perf_counter()
+        raw = generate_tournament(tournament_type, players, progress=0.5, seed=0)
+        print('%s, %s players, %s matches (generated in %.2fs)' % (tournament_type, players, len(raw['matches']), time.perf_counter() - start))
+
+        t = Tournament(raw)
+        _benchmark('Tournament model', lambda: Tournament(raw))
+        _benchmark('get_blocking_matches', lambda: get_blocking_matches(t))
+        _benchmark('get_current_matches_repr', lambda: get_current_matches_repr(t))
+        _benchmark('get_next_match (everyone)', lambda: [get_next_match(t, p, p.name) for p in t.participants], repeat=1)
+        if tournament_type in ['swiss', 'round robin']:
+            _benchmark('compute_standings', lambda: compute_standings(t))
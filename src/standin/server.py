@@ -0,0 +1,192 @@
+"""Local stand-in for the Challonge v1 API
+
+Serves the tournament, participant and match endpoints used by the bot, as XML
+(the format pychallonge_async parses), from an in-memory StandInState.
+Latency, error rate and rate limits can be configured to benchmark and load test the bot offline:
+
+    python -m standin.server --port 8443 --latency 0.2 --jitter 0.1 --error-rate 0.02 --rate-limit 300 --certfile cert.pem --keyfile key.pem
+
+The library always uses https: point the bot at the stand-in with "challonge_api_url": "127.0.0.1:8443/v1"
+in its config, and make it trust the certificate (SSL_CERT_FILE=cert.pem for a self-signed one)
+"""
+import argparse
+import asyncio
+import base64
+import random
+import re
+import ssl
+import time
+from collections import deque
+from datetime import datetime
+from xml.etree import ElementTree
+
+from aiohttp import web
+
+from standin.state import StandInState, StandInError
+
+
+_array_items = {'tournaments': 'tournament', 'participants': 'participant', 'matches': 'match', 'errors': 'error'}
+
+
+def _to_element(tag, value):
+    e = ElementTree.Element(tag)
+    if value is None:
+        e.set('nil', 'true')
+    elif isinstance(value, bool):
+        e.set('type', 'boolean')
+        e.text = 'true' if value else 'false'
+    elif isinstance(value, int):
+        e.set('type', 'integer')
+        e.text = str(value)
+    elif isinstance(value, float):
+        e.set('type', 'float')
+        e.text = str(value)
+    elif isinstance(value, datetime):
+        e.set('type', 'datetime')
+        e.text = value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            e.append(_to_element(k, v))
+    elif isinstance(value, list):
+        e.set('type', 'array')
+        for v in value:
+            e.append(_to_element(_array_items.get(tag, tag), v))
+    else:
+        e.text = str(value)
+    return e
+
+
+def to_xml(tag, value):
+    return b'<?xml version="1.0" encoding="UTF-8"?>\n' + ElementTree.tostring(_to_element(tag, value), encoding='utf-8')
+
+
+def parse_params(multidict):
+    """Challonge prefixes parameters with their resource: tournament[name], participants[][name]...
+    Returns (params, bulk) with prefixes stripped, bulk being the list of per-item params
+    """
+    params = {}
+    bulk = []
+    for key, value in multidict.items():
+        r = re.match(r'^\w+\[\]\[(\w+)\]$', key)
+        if r:
+            if not bulk or r.group(1) in bulk[-1]:
+                bulk.append({})
+            bulk[-1][r.group(1)] = value
+            continue
+        r = re.match(r'^\w+\[(\w+)\]$', key)
+        params[r.group(1) if r else key] = value
+    return params, bulk
+
+
+def _query(request):
+    """Query string parameters: request.GET up to aiohttp 2, request.query since"""
+    return request.query if hasattr(request, 'query') else request.GET
+
+
+class StandInServer:
+    def __init__(self, latency=0, jitter=0, error_rate=0, rate_limit=0, state=None):
+        self.state = state or StandInState()
+        self._latency = latency
+        self._jitter = jitter
+        self._error_rate = error_rate
+        self._rate_limit = rate_limit  # requests per minute and api key, 0 for no limit
+        self._requests = {}  # api key -> deque of request timestamps
+        self.requests_count = 0
+
+    def _api_key(self, request):
+        if _query(request).get('api_key'):
+            return _query(request)['api_key']
+        auth = request.headers.get('Authorization')
+        if auth:
+            try:
+                return base64.b64decode(auth.split(' ')[-1]).decode('utf-8').split(':', 1)[1]
+            except (ValueError, IndexError):
+                pass
+        return None
+
+    def _check_rate_limit(self, api_key):
+        if not self._rate_limit:
+            return
+        now = time.time()
+        requests = self._requests.setdefault(api_key, deque())
+        while requests and now - requests[0] >= 60:
+            requests.popleft()
+        if len(requests) >= self._rate_limit:
+            raise StandInError(429, 'Rate limit exceeded')
+        requests.append(now)
+
+    def _handler(self, tag, func):
+        async def handler(request):
+            self.requests_count += 1
+            delay = self._latency + random.uniform(0, self._jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                api_key = self._api_key(request)
+                if not api_key:
+                    raise StandInError(401, 'Unauthorized: missing API key')
+                self._check_rate_limit(api_key)
+                if random.random() < self._error_rate:
+                    raise StandInError(500, 'Internal server error (simulated)')
+                params, bulk = parse_params(_query(request))
+                if request.method in ['POST', 'PUT']:
+                    post_params, post_bulk = parse_params(await request.post())
+                    params.update(post_params)
+                    bulk.extend(post_bulk)
+                body = to_xml(tag, func(request.match_info, params, bulk))
+                status = 200
+            except StandInError as e:
+                body = to_xml('errors', e.messages)
+                status = e.status
+            return web.Response(body=body, status=status, content_type='application/xml')
+        return handler
+
+    def app(self, loop=None):
+        s = self.state
+        routes = [
+            ('GET', '/v1/tournaments', 'tournaments', lambda i, p, b: s.index_tournaments(p.get('state'))),
+            ('POST', '/v1/tournaments', 'tournament', lambda i, p, b: s.create_tournament(p)),
+            ('GET', '/v1/tournaments/{t}', 'tournament', lambda i, p, b: s.show_tournament(i['t'], p.get('include_participants') == '1', p.get('include_matches') == '1')),
+            ('PUT', '/v1/tournaments/{t}', 'tournament', lambda i, p, b: s.update_tournament(i['t'], p)),
+            ('DELETE', '/v1/tournaments/{t}', 'tournament', lambda i, p, b: s.destroy_tournament(i['t'])),
+            ('POST', '/v1/tournaments/{t}/process_check_ins', 'tournament', lambda i, p, b: s.process_check_ins(i['t'])),
+            ('POST', '/v1/tournaments/{t}/abort_check_in', 'tournament', lambda i, p, b: s.abort_check_in(i['t'])),
+            ('POST', '/v1/tournaments/{t}/start', 'tournament', lambda i, p, b: s.start_tournament(i['t'])),
+            ('POST', '/v1/tournaments/{t}/reset', 'tournament', lambda i, p, b: s.reset_tournament(i['t'])),
+            ('POST', '/v1/tournaments/{t}/finalize', 'tournament', lambda i, p, b: s.finalize_tournament(i['t'])),
+            ('GET', '/v1/tournaments/{t}/participants', 'participants', lambda i, p, b: s.index_participants(i['t'])),
+            ('POST', '/v1/tournaments/{t}/participants', 'participant', lambda i, p, b: s.create_participant(i['t'], p)),
+            ('POST', '/v1/tournaments/{t}/participants/bulk_add', 'participants', lambda i, p, b: s.bulk_add_participants(i['t'], b)),
+            ('POST', '/v1/tournaments/{t}/participants/randomize', 'participants', lambda i, p, b: s.randomize_participants(i['t'])),
+            ('GET', '/v1/tournaments/{t}/participants/{p}', 'participant', lambda i, p, b: s.get_participant(i['t'], i['p'])),
+            ('DELETE', '/v1/tournaments/{t}/participants/{p}', 'participant', lambda i, p, b: s.destroy_participant(i['t'], i['p'])),
+            ('POST', '/v1/tournaments/{t}/participants/{p}/check_in', 'participant', lambda i, p, b: s.check_in_participant(i['t'], i['p'])),
+            ('POST', '/v1/tournaments/{t}/participants/{p}/undo_check_in', 'participant', lambda i, p, b: s.check_in_participant(i['t'], i['p'], False)),
+            ('GET', '/v1/tournaments/{t}/matches', 'matches', lambda i, p, b: s.index_matches(i['t'], p.get('state'), p.get('participant_id'))),
+            ('GET', '/v1/tournaments/{t}/matches/{m}', 'match', lambda i, p, b: s.get_match(i['t'], i['m'])),
+            ('PUT', '/v1/tournaments/{t}/matches/{m}', 'match', lambda i, p, b: s.update_match(i['t'], i['m'], p)),
+        ]
+        app = web.Application(loop=loop)
+        for method, path, tag, func in routes:
+            app.router.add_route(method, path + '.xml', self._handler(tag, func))
+        return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the Challonge API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0, help='random extra latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='probability of a simulated 500 error')
+    parser.add_argument('--rate-limit', type=int, default=0, help='requests per minute and API key (0: unlimited)')
+    parser.add_argument('--certfile', help='serve https with this certificate (PEM)')
+    parser.add_argument('--keyfile', help='private key of the certificate, if not in certfile')
+    args = parser.parse_args()
+
+    ssl_context = None
+    if args.certfile:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(args.certfile, args.keyfile)
+    server = StandInServer(args.latency, args.jitter, args.error_rate, args.rate_limit)
+    web.run_app(server.app(), host=args.host, port=args.port, ssl_context=ssl_context)
@@ -0,0 +1,493 @@
+import math
+from datetime import datetime
+from itertools import count
+
+
+class StandInError(Exception):
+    """Mirrors the errors Challonge returns: a status code and a list of messages"""
+    def __init__(self, status, *messages):
+        self.status = status
+        self.messages = list(messages)
+
+    def __str__(self):
+        return ', '.join(self.messages)
+
+
+def _now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def _seeding_order(size):
+    """Seeds of the first round slots of a power-of-two bracket: 1 vs size, 2 vs size-1... spread apart"""
+    seeds = [1, 2]
+    while len(seeds) < size:
+        seeds = [x for s in seeds for x in (s, 2 * len(seeds) + 1 - s)]
+    return seeds
+
+
+class StandInState:
+    """In memory Challonge: tournaments, participants and matches as hyphen-keyed dicts,
+    as the Challonge API serves them
+    """
+    supported_types = ['single elimination', 'double elimination', 'round robin', 'swiss']
+
+    def __init__(self):
+        self._ids = count(1)
+        self.tournaments = {}  # id -> tournament
+        self.participants = {}  # t_id -> [participants]
+        self.matches = {}  # t_id -> [matches]
+        self._consumers = {}  # m_id -> [(match, slot)] filled by the winner / loser of that match
+        self._remaining = {}  # t_id -> number of matches not complete yet
+        self._swiss_byes = {}  # t_id -> participants ids who already got a bye
+
+    # tournaments
+
+    def get_tournament(self, t_key):
+        for t in self.tournaments.values():
+            if str(t['id']) == t_key or t['url'] == t_key:
+                return t
+        raise StandInError(404, 'Tournament not found')
+
+    def show_tournament(self, t_key, include_participants=False, include_matches=False):
+        t = dict(self.get_tournament(t_key))
+        if include_participants:
+            t['participants'] = self.participants[t['id']]
+        if include_matches:
+            t['matches'] = self.matches[t['id']]
+        return t
+
+    def index_tournaments(self, state=None):
+        return [t for t in self.tournaments.values() if not state or state == 'all' or t['state'] == state]
+
+    def create_tournament(self, params):
+        if not params.get('name'):
+            raise StandInError(422, 'Name can\'t be blank')
+        url = params.get('url') or 'standin_%s' % len(self.tournaments)
+        if any(t['url'] == url for t in self.tournaments.values()):
+            raise StandInError(422, 'URL is already taken')
+        tournament_type = params.get('tournament_type', 'single elimination')
+        if tournament_type not in StandInState.supported_types:
+            raise StandInError(422, 'Tournament type is not supported by the stand-in')
+
+        now = _now()
+        t = {'id': next(self._ids),
+             'name': params['name'],
+             'url': url,
+             'full-challonge-url': 'http://challonge.com/%s' % url,
+             'description': params.get('description', ''),
+             'tournament-type': tournament_type,
+             'state': 'pending',
+             'participants-count': 0,
+             'signup-cap': params.get('signup_cap'),
+             'start-at': params.get('start_at'),
+             'check-in-duration': params.get('check_in_duration'),
+             'swiss-rounds': int(params['swiss_rounds']) if params.get('swiss_rounds') else None,
+             'started-checking-in-at': None,
+             'created-at': now,
+             'updated-at': now,
+             'started-at': None,
+             'completed-at': None}
+        self.tournaments[t['id']] = t
+        self.participants[t['id']] = []
+        self._set_matches(t, [])
+        return t
+
+    def update_tournament(self, t_key, params):
+        t = self.get_tournament(t_key)
+        for key in ['name', 'description', 'signup_cap', 'start_at', 'check_in_duration']:
+            if key in params:
+                t[key.replace('_', '-')] = params[key]
+        t['updated-at'] = _now()
+        return t
+
+    def destroy_tournament(self, t_key):
+        t = self.get_tournament(t_key)
+        del self.tournaments[t['id']]
+        del self.participants[t['id']]
+        del self.matches[t['id']]
+        return t
+
+    def _require_state(self, t, *states):
+        if t['state'] not in states:
+            raise StandInError(422, 'Tournament is %s' % t['state'])
+
+    def process_check_ins(self, t_key):
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'pending')
+        if not t['started-checking-in-at']:
+            t['started-checking-in-at'] = _now()
+        else:
+            for p in [p for p in self.participants[t['id']] if not p['checked-in']]:
+                self._remove_participant(t, p)
+            t['started-checking-in-at'] = None
+        t['updated-at'] = _now()
+        return t
+
+    def abort_check_in(self, t_key):
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'pending')
+        t['started-checking-in-at'] = None
+        for p in self.participants[t['id']]:
+            p['checked-in'] = False
+            p['checked-in-at'] = None
+        return t
+
+    def start_tournament(self, t_key):
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'pending')
+        participants = sorted(self.participants[t['id']], key=lambda p: p['seed'])
+        if len(participants) < 2:
+            raise StandInError(422, 'Tournament must have at least 2 participants')
+
+        if t['tournament-type'] == 'round robin':
+            self._set_matches(t, self._build_round_robin(t, participants))
+        elif t['tournament-type'] == 'swiss':
+            self._swiss_byes[t['id']] = set()
+            self._set_matches(t, self._build_swiss_round(t, 1))
+        else:
+            self._set_matches(t, self._build_elimination(t, participants, t['tournament-type'] == 'double elimination'))
+        t['state'] = 'underway'
+        t['started-at'] = t['updated-at'] = _now()
+        return t
+
+    def reset_tournament(self, t_key):
+        t = self.get_tournament(t_key)
+        self._set_matches(t, [])
+        for p in self.participants[t['id']]:
+            p['final-rank'] = None
+        t['state'] = 'pending'
+        t['started-at'] = t['completed-at'] = None
+        t['updated-at'] = _now()
+        return t
+
+    def finalize_tournament(self, t_key):
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'awaiting_review')
+        if t['tournament-type'] in ['round robin', 'swiss']:
+            self._rank_by_wins(t)
+        else:
+            self._rank_by_elimination(t)
+        t['state'] = 'complete'
+        t['completed-at'] = t['updated-at'] = _now()
+        return t
+
+    # participants
+
+    def index_participants(self, t_key):
+        return self.participants[self.get_tournament(t_key)['id']]
+
+    def get_participant(self, t_key, p_key):
+        for p in self.index_participants(t_key):
+            if str(p['id']) == p_key:
+                return p
+        raise StandInError(404, 'Participant not found')
+
+    def create_participant(self, t_key, params):
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'pending')
+        name = params.get('name')
+        if not name:
+            raise StandInError(422, 'Name can\'t be blank')
+        participants = self.participants[t['id']]
+        if any(p['name'] == name for p in participants):
+            raise StandInError(422, 'Name has already been taken')
+        if t['signup-cap'] and len(participants) >= int(t['signup-cap']):
+            raise StandInError(422, 'Tournament is full')
+
+        now = _now()
+        p = {'id': next(self._ids),
+             'tournament-id': t['id'],
+             'name': name,
+             'misc': params.get('misc'),
+             'seed': len(participants) + 1,
+             'active': True,
+             'checked-in': False,
+             'checked-in-at': None,
+             'final-rank': None,
+             'created-at': now,
+             'updated-at': now}
+        participants.append(p)
+        t['participants-count'] = len(participants)
+        t['updated-at'] = now
+        return p
+
+    def bulk_add_participants(self, t_key, params_list):
+        self._require_state(self.get_tournament(t_key), 'pending')
+        return [self.create_participant(t_key, params) for params in params_list]
+
+    def check_in_participant(self, t_key, p_key, checked_in=True):
+        t = self.get_tournament(t_key)
+        if not t['started-checking-in-at']:
+            raise StandInError(422, 'Check-in is not open')
+        p = self.get_participant(t_key, p_key)
+        p['checked-in'] = checked_in
+        p['checked-in-at'] = _now() if checked_in else None
+        p['updated-at'] = t['updated-at'] = _now()
+        return p
+
+    def destroy_participant(self, t_key, p_key):
+        t = self.get_tournament(t_key)
+        p = self.get_participant(t_key, p_key)
+        self._remove_participant(t, p)
+        return p
+
+    def _remove_participant(self, t, p):
+        if t['state'] == 'pending':
+            participants = self.participants[t['id']]
+            participants.remove(p)
+            for index, other in enumerate(participants):
+                other['seed'] = index + 1
+            t['participants-count'] = len(participants)
+        else:
+            # underway: the participant forfeits every remaining match
+            p['active'] = False
+            for m in self.matches[t['id']]:
+                if m['state'] != 'complete' and p['id'] in (m['player1-id'], m['player2-id']):
+                    opponent_id = m['player2-id'] if m['player1-id'] == p['id'] else m['player1-id']
+                    if opponent_id:
+                        self.complete_match(t, m, opponent_id, m['scores-csv'] or '')
+        t['updated-at'] = _now()
+
+    def randomize_participants(self, t_key):
+        import random
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'pending')
+        participants = self.participants[t['id']]
+        random.shuffle(participants)
+        for index, p in enumerate(participants):
+            p['seed'] = index + 1
+        return participants
+
+    # matches
+
+    def index_matches(self, t_key, state=None, participant_id=None):
+        matches = self.matches[self.get_tournament(t_key)['id']]
+        if state and state != 'all':
+            matches = [m for m in matches if m['state'] == state]
+        if participant_id:
+            matches = [m for m in matches if str(participant_id) in (str(m['player1-id']), str(m['player2-id']))]
+        return matches
+
+    def get_match(self, t_key, m_key):
+        for m in self.index_matches(t_key):
+            if str(m['id']) == m_key:
+                return m
+        raise StandInError(404, 'Match not found')
+
+    def update_match(self, t_key, m_key, params):
+        t = self.get_tournament(t_key)
+        self._require_state(t, 'underway')
+        m = self.get_match(t_key, m_key)
+        if m['state'] == 'pending':
+            raise StandInError(422, 'Match is not open yet')
+        winner_id = params.get('winner_id')
+        if winner_id is None:
+            if 'scores_csv' in params:
+                m['scores-csv'] = params['scores_csv']
+                m['updated-at'] = _now()
+            return m
+        winner_id = int(winner_id)
+        if winner_id not in (m['player1-id'], m['player2-id']):
+            raise StandInError(422, 'Winner is not a participant of this match')
+        self.complete_match(t, m, winner_id, params.get('scores_csv', ''))
+        return m
+
+    def _new_match(self, t, round, identifier, player1_id=None, player2_id=None):
+        return {'id': next(self._ids),
+                'tournament-id': t['id'],
+                'state': 'pending',
+                'round': round,
+                'identifier': identifier,
+                'suggested-play-order': identifier,
+                'player1-id': player1_id,
+                'player2-id': player2_id,
+                'player1-prereq-match-id': None,
+                'player2-prereq-match-id': None,
+                'player1-is-prereq-match-loser': False,
+                'player2-is-prereq-match-loser': False,
+                'winner-id': None,
+                'loser-id': None,
+                'scores-csv': '',
+                'started-at': None,
+                'updated-at': _now(),
+                'completed-at': None}
+
+    def _open_if_ready(self, m):
+        if m['state'] == 'pending' and m['player1-id'] and m['player2-id']:
+            m['state'] = 'open'
+            m['started-at'] = m['updated-at'] = _now()
+
+    def _set_matches(self, t, matches):
+        for m in self.matches.get(t['id'], []):
+            self._consumers.pop(m['id'], None)
+        self.matches[t['id']] = []
+        self._remaining[t['id']] = 0
+        self._add_matches(t, matches)
+
+    def _add_matches(self, t, matches):
+        self.matches[t['id']].extend(matches)
+        for m in matches:
+            for slot in ['player1', 'player2']:
+                if m[slot + '-prereq-match-id']:
+                    self._consumers.setdefault(m[slot + '-prereq-match-id'], []).append((m, slot))
+            if m['state'] != 'complete':
+                self._remaining[t['id']] += 1
+
+    def complete_match(self, t, m, winner_id, scores_csv):
+        """Reports the result of a match, returns the matches it opened"""
+        now = _now()
+        m['state'] = 'complete'
+        m['winner-id'] = winner_id
+        m['loser-id'] = m['player2-id'] if m['player1-id'] == winner_id else m['player1-id']
+        m['scores-csv'] = scores_csv
+        m['completed-at'] = m['updated-at'] = now
+
+        opened = []
+        for other, slot in self._consumers.get(m['id'], []):
+            other[slot + '-id'] = m['loser-id'] if other[slot + '-is-prereq-match-loser'] else m['winner-id']
+            if other['state'] == 'pending':
+                self._open_if_ready(other)
+                if other['state'] == 'open':
+                    opened.append(other)
+
+        self._remaining[t['id']] -= 1
+        if self._remaining[t['id']] == 0:
+            played_rounds = max(x['round'] for x in self.matches[t['id']])
+            if t['tournament-type'] == 'swiss' and played_rounds < self.swiss_rounds(t):
+                next_round = self._build_swiss_round(t, played_rounds + 1)
+                self._add_matches(t, next_round)
+                opened.extend(next_round)
+            else:
+                t['state'] = 'awaiting_review'
+        t['updated-at'] = now
+        return opened
+
+    def _pair(self, t, matches, round, a, b):
+        """Match between two slots, a slot being a participant id, a (match, is_loser) tuple or None for a bye.
+        Returns the (winner, loser) slots of that match, a bye simply passing the other slot through
+        """
+        if a is None or b is None:
+            return (a if b is None else b), None
+        m = self._new_match(t, round, len(matches) + 1)
+        for slot, value in [('player1', a), ('player2', b)]:
+            if isinstance(value, tuple):
+                m[slot + '-prereq-match-id'] = value[0]['id']
+                m[slot + '-is-prereq-match-loser'] = value[1]
+            else:
+                m[slot + '-id'] = value
+        self._open_if_ready(m)
+        matches.append(m)
+        return (m, False), (m, True)
+
+    def _build_elimination(self, t, participants, double):
+        size = 2
+        while size < len(participants):
+            size *= 2
+        slots = [participants[s - 1]['id'] if s <= len(participants) else None for s in _seeding_order(size)]
+        matches = []
+        round = 0
+        wb_losers = []  # loser slots of each winners bracket round
+        while len(slots) > 1:
+            round += 1
+            results = [self._pair(t, matches, round, a, b) for a, b in zip(slots[0::2], slots[1::2])]
+            slots = [winner for winner, _ in results]
+            wb_losers.append([loser for _, loser in results])
+        if not double:
+            return matches
+
+        lb_round = 0
+
+        def lb_pairs(pairs):
+            nonlocal lb_round
+            count = len(matches)
+            winners = [self._pair(t, matches, -(lb_round + 1), a, b)[0] for a, b in pairs]
+            if len(matches) > count:
+                lb_round += 1
+            return winners
+
+        lb = wb_losers[0]
+        if len(lb) > 1:
+            lb = lb_pairs(zip(lb[0::2], lb[1::2]))
+        for index, drops in enumerate(wb_losers[1:]):
+            # alternate the drop order so that players don't meet their winners bracket opponent again
+            lb = lb_pairs(zip(lb, drops if index % 2 else drops[::-1]))
+            if len(lb) > 1:
+                lb = lb_pairs(zip(lb[0::2], lb[1::2]))
+
+        self._pair(t, matches, round + 1, slots[0], lb[0])  # grand final
+        return matches
+
+    def _build_round_robin(self, t, participants):
+        # circle method: the first player stays, the others rotate
+        ids = [p['id'] for p in participants]
+        if len(ids) % 2:
+            ids.append(None)
+        matches = []
+        for round in range(1, len(ids)):
+            for i in range(len(ids) // 2):
+                a, b = ids[i], ids[-1 - i]
+                if a is not None and b is not None:
+                    m = self._new_match(t, round, len(matches) + 1, a, b)
+                    self._open_if_ready(m)
+                    matches.append(m)
+            ids = [ids[0]] + [ids[-1]] + ids[1:-1]
+        return matches
+
+    def swiss_rounds(self, t):
+        return t['swiss-rounds'] or max(1, math.ceil(math.log2(t['participants-count'])))
+
+    def _build_swiss_round(self, t, round):
+        """Pairs players with the same number of wins, avoiding rematches when possible"""
+        wins = {}
+        played = set()
+        for m in self.matches[t['id']]:
+            wins[m['winner-id']] = wins.get(m['winner-id'], 0) + 1
+            played.add(frozenset((m['player1-id'], m['player2-id'])))
+        active = [p for p in self.participants[t['id']] if p['active']]
+        unpaired = [p['id'] for p in sorted(active, key=lambda p: (-wins.get(p['id'], 0), p['seed']))]
+
+        byes = self._swiss_byes[t['id']]
+        if len(unpaired) % 2:
+            bye = next((x for x in reversed(unpaired) if x not in byes), unpaired[-1])
+            byes.add(bye)
+            unpaired.remove(bye)
+
+        matches = []
+        identifier = len(self.matches[t['id']])
+        while unpaired:
+            a = unpaired.pop(0)
+            b = next((x for x in unpaired if frozenset((a, x)) not in played), unpaired[0])
+            unpaired.remove(b)
+            m = self._new_match(t, round, identifier + len(matches) + 1, a, b)
+            self._open_if_ready(m)
+            matches.append(m)
+        return matches
+
+    def _assign_ranks(self, t, keys):
+        """Lower keys rank better, equal keys share the same rank"""
+        ordered = sorted(self.participants[t['id']], key=lambda p: keys[p['id']])
+        for index, p in enumerate(ordered):
+            if index > 0 and keys[p['id']] == keys[ordered[index - 1]['id']]:
+                p['final-rank'] = ordered[index - 1]['final-rank']
+            else:
+                p['final-rank'] = index + 1
+
+    def _rank_by_elimination(self, t):
+        # later eliminations rank better, players eliminated in the same round share their rank
+        matches = self.matches[t['id']]
+        final_round = max(m['round'] for m in matches)
+        double = t['tournament-type'] == 'double elimination'
+        keys = {p['id']: -2 * final_round - 1 for p in self.participants[t['id']]}
+        for m in matches:
+            if not m['loser-id'] or (double and 0 < m['round'] < final_round):
+                continue  # winners bracket losers drop to the losers bracket
+            lateness = abs(m['round']) if m['round'] < 0 else final_round + m['round']
+            keys[m['loser-id']] = -lateness
+        self._assign_ranks(t, keys)
+
+    def _rank_by_wins(self, t):
+        wins = {p['id']: 0 for p in self.participants[t['id']]}
+        for m in self.matches[t['id']]:
+            if m['winner-id']:
+                wins[m['winner-id']] += 1
+        self._assign_ranks(t, {p_id: -w for p_id, w in wins.items()})
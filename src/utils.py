@@ -1,3 +1,4 @@
+import asyncio
 import re
 from enum import Enum
 
@@ -57,6 +58,25 @@ def paginate(dump, max_per_page=2000):
     return paginated
 
 
+def paginate_lines(lines, max_per_page=2000):
+    """Generator of pages made of whole lines, consuming the lines as pages are requested
+    Lines longer than a page are cut
+    """
+    page = []
+    length = 0
+    for line in lines:
+        for start in range(0, max(len(line), 1), max_per_page):
+            chunk = line[start:start + max_per_page]
+            if page and length + len(chunk) > max_per_page:
+                yield '\n'.join(page)
+                page = []
+                length = 0
+            page.append(chunk)
+            length += len(chunk) + 1
+    if page:
+        yield '\n'.join(page)
+
+
 def get_user_id_from_mention(mention):
     results = re.findall(r'<@!?([0-9]+)>', mention)
     if len(results) == 1:
@@ -86,3 +106,75 @@ class ArrayFormater:
         for line in self.lines:
             txt += pattern.format(line) + '\n'
         return txt
+
+
+async def gather_bounded(coros, limit):
+    """Runs the coroutines, at most `limit` at a time, and returns their results in order"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+    return await asyncio.gather(*[bounded(c) for c in coros])
+
+
+async def gather_all(*coros):
+    """Runs the coroutines concurrently, all of them even if some fail
+    Returns (results, errors): results in order (None for failures) and the exceptions raised
+    """
+    outcomes = await asyncio.gather(*coros, return_exceptions=True)
+    errors = [x for x in outcomes if isinstance(x, Exception)]
+    return [None if isinstance(x, Exception) else x for x in outcomes], errors
+
+
+async def gather_paced(coros, batch_size, interval):
+    """Runs the coroutines by batches of `batch_size`, batches starting at least `interval` seconds apart,
+    and returns their results in order
+    """
+    loop = asyncio.get_event_loop()
+    coros = list(coros)
+    results = []
+    for index in range(0, len(coros), batch_size):
+        started = loop.time()
+        results.extend(await asyncio.gather(*coros[index:index + batch_size]))
+        if index + batch_size < len(coros):
+            await asyncio.sleep(max(0, interval - (loop.time() - started)))
+    return results
+
+
+class Debouncer:
+    """Coalesces bursts of calls per key
+
+    The first call of a key opens a window of `delay` seconds. When it closes, the function is awaited
+    once, with the arguments of the last call made in the meantime. Calls made while it runs open
+    a new window, so the latest arguments are always applied in the end
+    """
+    def __init__(self, delay):
+        self._delay = delay
+        self._latest = {}  # key -> (func, args)
+        self._tasks = {}  # key -> (token, task)
+
+    def schedule(self, key, func, *args):
+        self._latest[key] = (func, args)
+        if key not in self._tasks:
+            token = object()
+            self._tasks[key] = (token, asyncio.ensure_future(self._run(key, token)))
+
+    def cancel(self, key):
+        self._latest.pop(key, None)
+        _, task = self._tasks.pop(key, (None, None))
+        if task:
+            task.cancel()
+
+    async def _run(self, key, token):
+        try:
+            while key in self._latest:
+                await asyncio.sleep(self._delay)
+                func, args = self._latest.pop(key)
+                try:
+                    await func(*args)
+                except Exception:
+                    log_main.exception('Debouncer %s' % (key,))
+        finally:
+            if self._tasks.get(key, (None,))[0] is token:  # not replaced after a cancel
+                del self._tasks[key]
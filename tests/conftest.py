@@ -0,0 +1,41 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# config.py reads config/config.json from the working directory as soon as it is imported
+_directory = tempfile.mkdtemp(prefix='challonge_bot_tests_')
+os.makedirs(os.path.join(_directory, 'config'))
+with open(os.path.join(_directory, 'config', 'config.json'), 'w') as f:
+    json.dump({'devid': '0', 'discord_token': '', 'cryptokey': 'MTIzNDU2Nzg=', 'database': ':memory:', 'whitelistedbots': []}, f)
+os.chdir(_directory)
+
+
+@pytest.fixture
+def run():
+    """Runs a coroutine until complete, on an event loop of its own for each test"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop.run_until_complete
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.fixture
+def tables():
+    """Tables of every database model, empty, in the bot in-memory database"""
+    from database.core import db
+    from database.meta import DBModel
+    import database.models
+    models = [x for x in vars(database.models).values() if isinstance(x, DBModel)]
+    for model in models:
+        db._c.execute('CREATE TABLE {0} ({1});'.format(model, ', '.join(model.columns)))
+    yield db
+    for model in models:
+        db._c.execute('DROP TABLE {0};'.format(model))
+    db._conn.commit()
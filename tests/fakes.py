@@ -0,0 +1,79 @@
+"""Stand-ins for the Challonge account and the Discord objects of the tests"""
+import copy
+
+
+class _Resource:
+    def __init__(self, name, calls, methods):
+        self._name = name
+        self._calls = calls
+        self._methods = methods
+
+    def __getattr__(self, method):
+        func = self._methods[method]  # any other call fails the test
+
+        async def call(*args, **kwargs):
+            self._calls.append((self._name, method))
+            return copy.deepcopy(func(*args, **kwargs))  # as fresh as a parsed response
+        return call
+
+
+class CountingAccount:
+    """Account answering from a stand-in state, recording every call made"""
+    def __init__(self, state):
+        self.calls = []
+        self.tournaments = _Resource('tournaments', self.calls, {
+            'show': lambda t_id, include_participants=0, include_matches=0: state.show_tournament(str(t_id), include_participants == 1, include_matches == 1)})
+        self.matches = _Resource('matches', self.calls, {
+            'update': lambda t_id, m_id, **params: state.update_match(str(t_id), str(m_id), params)})
+
+
+class Member:
+    def __init__(self, member_id, name):
+        self.id = member_id
+        self.name = name
+        self.mention = '<@%s>' % member_id
+
+
+class Server:
+    def __init__(self, members):
+        self.id = 'server'
+        self.members = members
+        self.me = members[0]
+        self.roles = []
+        self.channels = []
+
+    def get_member(self, member_id):
+        return next((m for m in self.members if m.id == member_id), None)
+
+    def get_member_named(self, name):
+        return next((m for m in self.members if m.name == name), None)
+
+
+class Channel:
+    def __init__(self, server):
+        self.id = 'channel'
+        self.server = server
+        self.topic = None
+        self.is_private = False
+        self.mention = '<#channel>'
+
+
+class Message:
+    def __init__(self, author, channel, content=''):
+        self.author = author
+        self.channel = channel
+        self.server = channel.server
+        self.content = content
+
+
+class Client:
+    def __init__(self):
+        self.sent = []
+        self.files = []
+
+    async def send_message(self, destination, content=None, **kwargs):
+        self.sent.append((destination, content))
+
+    async def send_file(self, destination, fp, filename=None, content=None, **kwargs):
+        self.sent.append((destination, content))
+        self.files.append((filename, fp.read()))
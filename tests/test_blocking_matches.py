@@ -0,0 +1,171 @@
+"""get_blocking_matches against the implementation it replaced, on generated brackets
+
+The previous implementation walked the raw payload from every pending match someone waits on,
+appending the matches it went through to a list that was then credited to the open matches found.
+The current one gives the same answers except where that bookkeeping was wrong, on purpose:
+
+- a match was counted once per slot walked through, and the open match behind a player 2 slot
+  was counted as well: counts are now distinct pending matches
+- a single list was shared by all the open matches found from the same waiting match, so each of
+  them was also credited with the matches behind the others
+- the walk stopped at matches already credited to an open match, so a second open match leading
+  to them was credited with less, or not listed at all. Every open match leading to a blocked
+  match is now credited with it
+"""
+import pytest
+
+pytest.importorskip('challonge')
+
+from standin.generator import generate_tournament  # noqa: E402
+from challonge_impl.bracket import Tournament  # noqa: E402
+from challonge_impl.utils import get_blocked_matches, get_blocking_matches  # noqa: E402
+
+
+def previous_blocking(t):
+    """Frozen copy of the previous implementation, on a raw payload: open match id -> blocked list"""
+    def find(cont, key, value):
+        found = [x for x in cont if x[key] == value]
+        if len(found) > 0:
+            return found[0]
+        return None
+
+    matches = t['matches']
+    blocking = {}
+
+    def process_prereq_match(m, player, blocked):
+        key = '%s-prereq-match-id' % player
+        if key in m and m[key]:
+            found = False
+            for k, v in blocking.items():
+                if m[key] in v:
+                    blocking[k].append(m['id'])
+                    found = True
+            if not found:
+                blocked.append(m['id'])
+                return m[key]
+        return None
+
+    def check_match(m_id, blocked):
+        for k, v in blocking.items():
+            if m_id in v:
+                blocking[k].extend(blocked)
+                return
+        m = find(matches, 'id', m_id)
+        if not m:
+            return
+        if m['state'] == 'pending':
+            processed = process_prereq_match(m, 'player1', blocked)
+            if processed:
+                check_match(processed, blocked)
+            processed = process_prereq_match(m, 'player2', blocked)
+            if processed:
+                blocked.append(processed)
+                check_match(processed, blocked)
+        elif m['state'] == 'open':
+            if m_id in blocking:
+                blocking[m_id].extend(blocked)
+            else:
+                blocking.update({m_id: blocked})
+
+    for m in matches:
+        if m['state'] == 'pending' and (m['player1-id'] or m['player2-id']):
+            found = False
+            for k, v in blocking.items():
+                if m['id'] in v:
+                    found = True
+            if not found:
+                blocked = [m['id']]
+                if not m['player1-id'] and 'player1-prereq-match-id' in m and m['player1-prereq-match-id']:
+                    check_match(m['player1-prereq-match-id'], blocked)
+                if not m['player2-id'] and 'player2-prereq-match-id' in m and m['player2-prereq-match-id']:
+                    check_match(m['player2-prereq-match-id'], blocked)
+    return blocking
+
+
+def empty_slot_prereqs(m):
+    return [prereq_id for seated_id, prereq_id in [(m.player1_id, m.player1_prereq_id), (m.player2_id, m.player2_prereq_id)]
+            if not seated_id and prereq_id]
+
+
+def leads_to(t, m_id):
+    """Pending matches reached from that match, through their empty slots"""
+    consumers = {}
+    for m in t.matches_in_state('pending'):
+        for prereq_id in empty_slot_prereqs(m):
+            consumers.setdefault(prereq_id, []).append(m.id)
+    reached = set()
+    stack = list(consumers.get(m_id, []))
+    while stack:
+        x = stack.pop()
+        if x not in reached:
+            reached.add(x)
+            stack.extend(consumers.get(x, []))
+    return reached
+
+
+def reference_blocking(t):
+    """Straightforward version: walk back from the matches someone waits on"""
+    relevant = set()
+    stack = [m.id for m in t.matches_in_state('pending') if m.player1_id or m.player2_id]
+    while stack:
+        m_id = stack.pop()
+        if m_id not in relevant:
+            relevant.add(m_id)
+            stack.extend(x for x in empty_slot_prereqs(t.match(m_id)) if t.match(x) and t.match(x).state == 'pending')
+
+    blocking = {}
+    for m_id in relevant:
+        stack = empty_slot_prereqs(t.match(m_id))
+        seen = set()
+        while stack:
+            x = stack.pop()
+            prereq = t.match(x)
+            if x in seen or not prereq:
+                continue
+            seen.add(x)
+            if prereq.state == 'open':
+                blocking.setdefault(x, set()).add(m_id)
+            elif prereq.state == 'pending':
+                stack.extend(empty_slot_prereqs(prereq))
+    return blocking
+
+
+def generated_brackets():
+    for tournament_type in ['single elimination', 'double elimination']:
+        for players in [2, 3, 5, 8, 13, 16, 33, 64, 100, 255, 512, 2048]:
+            for progress in [0.1, 0.3, 0.5, 0.8]:
+                for seed in range(3 if players < 500 else 1):
+                    yield tournament_type, players, progress, seed
+
+
+@pytest.mark.parametrize('tournament_type, players, progress, seed', list(generated_brackets()))
+def test_against_previous_implementation(tournament_type, players, progress, seed):
+    raw = generate_tournament(tournament_type, players, progress=progress, seed=seed)
+    t = Tournament(raw)
+    blocked = get_blocked_matches(t)
+    previous = previous_blocking(raw)
+
+    assert blocked == reference_blocking(t)
+    # every open match listed before still is, with at least the matches it leads to that were counted
+    for m_id, previous_blocked in previous.items():
+        assert m_id in blocked
+        assert set(previous_blocked) & leads_to(t, m_id) <= blocked[m_id]
+
+
+def test_documented_differences():
+    raw = generate_tournament('single elimination', 13, progress=0.3, seed=0)
+    t = Tournament(raw)
+    blocked = get_blocked_matches(t)
+    assert len(blocked) == 2
+    first, second = sorted(blocked)
+
+    previous = previous_blocking(raw)
+    # the two matches blocked, counted several times, and the other open match: 8 games
+    assert list(previous) == [first]
+    assert len(previous[first]) == 8
+    assert set(previous[first]) == blocked[first] | {second}
+
+    # both open matches lead to the same two matches
+    assert blocked[first] == blocked[second]
+    assert len(blocked[first]) == 2
+    assert get_blocking_matches(t).count('`2 games blocked`') == 2
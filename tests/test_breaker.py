@@ -0,0 +1,147 @@
+"""Challonge circuit breaker"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('challonge')
+
+from challonge import ChallongeException  # noqa: E402
+from challonge_impl.accounts import GuardedAccount  # noqa: E402
+from challonge_impl.breaker import CircuitBreaker, BreakerState, ChallongeUnavailable  # noqa: E402
+import challonge_impl.accounts  # noqa: E402
+import challonge_impl.breaker  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class Request:
+    """Counts its calls, failing like an unreachable Challonge until told otherwise"""
+    def __init__(self, error=ConnectionRefusedError):
+        self.calls = 0
+        self.error = error
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release:
+            await self.release.wait()
+        if self.error:
+            raise self.error()
+        return 'ok'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(challonge_impl.breaker, 'time', clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(run, clock):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=30)
+    request = Request()
+
+    for _ in range(2):
+        with pytest.raises(ChallongeUnavailable):
+            run(breaker.call(request))
+    request.error = None
+    assert run(breaker.call(request)) == 'ok'  # the count starts again
+    request.error = ConnectionRefusedError
+    for _ in range(2):
+        with pytest.raises(ChallongeUnavailable):
+            run(breaker.call(request))
+    assert breaker.state == BreakerState.Closed
+
+    with pytest.raises(ChallongeUnavailable):
+        run(breaker.call(request))
+    assert breaker.state == BreakerState.Open
+    assert request.calls == 6
+
+    # fails fast while open
+    clock.now += 29
+    with pytest.raises(ChallongeUnavailable):
+        run(breaker.call(request))
+    assert request.calls == 6
+
+
+def test_challonge_errors_are_answers(run, clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    request = Request(ChallongeException)
+    for _ in range(3):
+        with pytest.raises(ChallongeException) as e:
+            run(breaker.call(request))
+        assert not isinstance(e.value, ChallongeUnavailable)
+    assert breaker.state == BreakerState.Closed
+
+
+def test_half_open_lets_a_single_probe_through(run, clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=30)
+    request = Request()
+    with pytest.raises(ChallongeUnavailable):
+        run(breaker.call(request))
+    clock.now += 30
+    assert breaker.state == BreakerState.HalfOpen
+
+    # the probe fails: open again for a whole recovery time
+    with pytest.raises(ChallongeUnavailable):
+        run(breaker.call(request))
+    assert breaker.state == BreakerState.Open
+    assert request.calls == 2
+
+    clock.now += 30
+    request.error = None
+    request.release = asyncio.Event()
+
+    async def concurrent_requests():
+        probe = asyncio.ensure_future(breaker.call(request))
+        await asyncio.sleep(0)  # the probe is waiting on Challonge
+        with pytest.raises(ChallongeUnavailable):
+            await breaker.call(request)
+        request.release.set()
+        return await probe
+
+    assert run(concurrent_requests()) == 'ok'
+    assert request.calls == 3
+    assert breaker.state == BreakerState.Closed
+    assert run(breaker.call(request)) == 'ok'
+
+
+class SlowEndpoint:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def show(self, t_id, **params):
+        await asyncio.sleep(self.delay)
+        return {'id': t_id}
+
+    async def bulk_add(self, t_id, names):
+        await asyncio.sleep(self.delay)
+        return [{'name': name} for name in names]
+
+
+class SlowAccount:
+    def __init__(self, delay):
+        self.tournaments = SlowEndpoint(delay)
+        self.participants = SlowEndpoint(delay)
+
+
+def test_timeout_per_call(run, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1)
+    monkeypatch.setattr(challonge_impl.accounts, 'breaker', breaker)
+    monkeypatch.setattr(challonge_impl.accounts, 'C_ChallongeTimeout', 0.01)
+    account = GuardedAccount(SlowAccount(0.05))
+
+    # slow by nature: only limited by the library
+    assert run(account.tournaments.show('1', include_participants=1, include_matches=1)) == {'id': '1'}
+    assert len(run(account.participants.bulk_add('1', ['a', 'b']))) == 2
+    assert breaker.state == BreakerState.Closed
+
+    with pytest.raises(ChallongeUnavailable):
+        run(account.tournaments.show('1'))
+    assert breaker.state == BreakerState.Open
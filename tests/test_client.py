@@ -0,0 +1,32 @@
+"""Outbound Discord requests queue"""
+import asyncio
+
+import pytest
+
+discord = pytest.importorskip('discord')
+pytest.importorskip('challonge')
+
+from challonge_impl.breaker import ChallongeUnavailable  # noqa: E402
+from commands.core import WrongChannel  # noqa: E402
+from discord_impl.client import QueuedClient  # noqa: E402
+from fakes import Member, Server, Channel  # noqa: E402
+
+
+def test_exceptions_are_sent_as_text(run, monkeypatch):
+    sent = []
+
+    async def send_message(self, destination, content=None, **kwargs):
+        sent.append(content)
+        return content
+    monkeypatch.setattr(discord.Client, 'send_message', send_message)
+
+    client = QueuedClient(loop=asyncio.get_event_loop())
+    channel = Channel(Server([Member('0', 'Bot')]))
+
+    async def replies():
+        return await asyncio.gather(client.send_message(channel, WrongChannel()),
+                                    client.send_message(channel, ChallongeUnavailable()))
+
+    merged = '%s\n%s' % (WrongChannel(), ChallongeUnavailable())
+    assert run(replies()) == [merged, merged]
+    assert sent == [merged]
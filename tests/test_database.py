@@ -0,0 +1,17 @@
+"""Database schema"""
+import os
+import sqlite3
+
+from database.models import DBTournamentUser, DBSnapshot, DBMatchHistory, DBRating
+
+create_tables = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'config', 'createTables.sql')
+
+
+def test_create_tables_match_models():
+    conn = sqlite3.connect(':memory:')
+    with open(create_tables) as f:
+        conn.executescript(f.read())
+    for model in [DBTournamentUser, DBSnapshot, DBMatchHistory, DBRating]:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info({0});'.format(model))]
+        assert columns == model.columns
+    conn.close()
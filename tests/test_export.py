@@ -0,0 +1,70 @@
+"""Tournament export"""
+import json
+
+import pytest
+
+pytest.importorskip('challonge')
+pytest.importorskip('discord')
+
+import commands.definitions.challonge  # noqa: E402
+from commands.core import cmds  # noqa: E402
+from challonge_impl.breaker import ChallongeUnavailable  # noqa: E402
+from challonge_impl.snapshot import snapshots  # noqa: E402
+from standin.generator import generate_tournament  # noqa: E402
+from standin.state import StandInState  # noqa: E402
+from fakes import CountingAccount, Member, Server, Channel, Message, Client  # noqa: E402
+
+
+class UnavailableAccount:
+    class tournaments:
+        async def show(*args, **kwargs):
+            raise ChallongeUnavailable()
+
+
+def run_export(run, tables, monkeypatch, account, t_ids):
+    async def get_account(user_id):
+        return account, None
+    monkeypatch.setattr(commands.definitions.challonge, 'get_account', get_account)
+
+    server = Server([Member('0', 'Bot'), Member('1', 'Organizer')])
+    for t_id in t_ids:
+        channel = Channel(server)
+        channel.id = 'channel%s' % t_id
+        tables.add_tournament(t_id, channel, 'role%s' % t_id, 'host')
+    client = Client()
+    message = Message(server.members[1], Channel(server), 'export jsonl')
+
+    run(cmds.find('export').execute(client, message, ['jsonl'], {}))
+    return client
+
+
+def test_export_bypasses_snapshot_store(run, tables, monkeypatch):
+    state = StandInState()
+    t_ids = []
+    for players in [4, 6]:
+        t = state.create_tournament({'name': 'Exported %s' % players, 'tournament_type': 'single elimination'})
+        t_ids.append(str(t['id']))
+        state.bulk_add_participants(t_ids[-1], [{'name': 'Player%s' % i} for i in range(players)])
+
+    client = run_export(run, tables, monkeypatch, CountingAccount(state), t_ids)
+
+    assert client.sent[0][1].startswith('✅ 2 tournament(s) exported')
+    filename, data = client.files[0]
+    assert filename == 'tournaments.jsonl'
+    records = [json.loads(line) for line in data.decode('utf-8').splitlines()]
+    assert len(records) == 4 + 6  # participants of both pending tournaments
+    for t_id in t_ids:
+        assert snapshots.get(t_id) == (None, None)
+
+
+def test_export_refuses_stale_data(run, tables, monkeypatch):
+    raw = generate_tournament('single elimination', 4, progress=0.5, seed=0)
+    t_id = str(raw['id'])
+    snapshots.put(t_id, raw)
+    try:
+        client = run_export(run, tables, monkeypatch, UnavailableAccount(), [t_id])
+    finally:
+        snapshots.prune(t_id)
+
+    assert not client.files
+    assert client.sent[0][1] == '✅ 0 tournament(s) exported\n⚠ {0}: {1}'.format(t_id, ChallongeUnavailable())
@@ -0,0 +1,28 @@
+"""Bracket image cache"""
+import os
+
+import pytest
+
+pytest.importorskip('PIL')
+
+from standin.generator import generate_tournament  # noqa: E402
+from challonge_impl.bracket import Tournament  # noqa: E402
+from challonge_impl.images import BracketImageCache  # noqa: E402
+
+
+def test_prune_with_database_id(run, tmpdir):
+    cache = BracketImageCache(str(tmpdir), 1024 * 1024, 1024 * 1024)
+    t = Tournament(generate_tournament('double elimination', 8, progress=0.5, seed=0))
+
+    try:
+        png = run(cache.get(t, 3))
+        assert png.startswith(b'\x89PNG')
+        assert run(cache.get(t, 3)) is png  # from memory
+    finally:
+        if cache._executor:
+            cache._executor.shutdown()
+
+    assert os.listdir(str(tmpdir))
+    cache.prune(str(t.id))  # as the destroy command does, with the id stored in the database
+    assert not cache._memory
+    assert not os.listdir(str(tmpdir))
@@ -0,0 +1,77 @@
+"""Events dispatched by the poller for changes made outside of the bot"""
+import pytest
+
+pytest.importorskip('challonge')
+
+import challonge_impl.poller  # noqa: E402
+from challonge_impl.events import Events  # noqa: E402
+from challonge_impl.poller import TournamentPoller  # noqa: E402
+from challonge_impl.snapshot import snapshots, TournamentSnapshot  # noqa: E402
+from database.models import DBTournament  # noqa: E402
+from standin.state import StandInState  # noqa: E402
+from fakes import CountingAccount  # noqa: E402
+
+
+class Server:
+    id = 'server'
+    me = None
+
+    def get_channel(self, channel_id):
+        return None
+
+
+class Modules:
+    def __init__(self):
+        self.events = []
+
+    async def on_event(self, server_id, event, **event_args):
+        self.events.append((event, event_args.get('p1_name'), event_args.get('p2_name')))
+
+    async def on_state_change(self, server_id, new_state, **event_args):
+        pass
+
+
+def test_changes_read_by_commands_are_dispatched_once(run, tables, monkeypatch):
+    state = StandInState()
+    t_id = str(state.create_tournament({'name': 'Polled', 'tournament_type': 'single elimination'})['id'])
+    state.bulk_add_participants(t_id, [{'name': name} for name in ['Alice', 'Bob', 'Carol', 'Dave']])
+    state.start_tournament(t_id)
+    names = {p['id']: p['name'] for p in state.participants[int(t_id)]}
+    website_match, bot_match = [m for m in state.matches[int(t_id)] if m['state'] == 'open']
+
+    account = CountingAccount(state)
+    modules = Modules()
+
+    async def get_account(user_id):
+        return account, None
+    monkeypatch.setattr(challonge_impl.poller, 'get_account', get_account)
+    monkeypatch.setattr(challonge_impl.poller, 'modules', modules)
+
+    poller = TournamentPoller()
+    server = Server()
+    db_t = DBTournament(t_id, server.id, 'channel', 'role', 'host')
+
+    async def scenario():
+        await TournamentSnapshot(account, t_id).get()
+        await poller._poll(server, db_t)
+        assert modules.events == []
+
+        # reported on the website, then read by a command (status, next...) before the next poll
+        state.update_match(t_id, str(website_match['id']), {'winner_id': website_match['player1-id'], 'scores_csv': '2-0'})
+        await TournamentSnapshot(account, t_id).get()
+        await poller._poll(server, db_t)
+        assert modules.events == [(Events.on_update_score, names[website_match['player1-id']], names[website_match['player2-id']])]
+
+        # reported with a command, which dispatched its own event
+        del modules.events[:]
+        snapshot = TournamentSnapshot(account, t_id)
+        await snapshot.get()
+        await account.matches.update(t_id, bot_match['id'], scores_csv='2-1', winner_id=bot_match['player2-id'])
+        await snapshot.refresh()
+        await poller._poll(server, db_t)
+        assert modules.events == []
+
+    try:
+        run(scenario())
+    finally:
+        snapshots.prune(t_id)
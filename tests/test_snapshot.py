@@ -0,0 +1,43 @@
+"""Snapshots persisted in the database"""
+import pickle
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('challonge')
+
+from challonge_impl.snapshot import SnapshotStore  # noqa: E402
+from standin.generator import generate_tournament  # noqa: E402
+
+unpickled = []
+
+
+def _unpickle():
+    unpickled.append(True)
+    return {}
+
+
+class Payload:
+    def __reduce__(self):
+        return _unpickle, ()
+
+
+def test_restart_reads_the_same_payload(tables):
+    raw = generate_tournament('double elimination', 8, progress=0.5, seed=0)
+    raw['started-at'] = datetime(2026, 10, 19, 18, 30, 5, 120, tzinfo=timezone(timedelta(hours=2)))
+    raw['matches'][0]['underway-at'] = datetime(2026, 10, 19, 18, 31)
+    t_id = str(raw['id'])
+    version = SnapshotStore().put(t_id, raw)
+
+    restarted = SnapshotStore()
+    assert restarted.get_versioned(t_id)[0] == raw
+    assert restarted.get_versioned(t_id)[2] == version
+    assert zlib.decompress(tables.get_snapshot(t_id).data).startswith(b'{')
+
+
+def test_pickled_rows_are_not_loaded(tables):
+    tables.set_snapshot('1', 1, '2026-10-19 18:30:00', zlib.compress(pickle.dumps(Payload())))
+    assert SnapshotStore().get('1') == (None, None)
+    assert not unpickled
+    assert tables.get_snapshot('1').data is None
@@ -0,0 +1,85 @@
+"""Read-only commands answered from the last known snapshot while Challonge is unavailable"""
+import pytest
+
+pytest.importorskip('challonge')
+pytest.importorskip('discord')
+
+import challonge_impl.accounts  # noqa: E402
+import commands.core  # noqa: E402
+from commands.core import cmds  # noqa: E402
+from challonge_impl.accounts import GuardedAccount  # noqa: E402
+from challonge_impl.breaker import CircuitBreaker, BreakerState, ChallongeUnavailable  # noqa: E402
+from challonge_impl.snapshot import snapshots, renders, TournamentSnapshot  # noqa: E402
+from const import T_StaleSnapshot  # noqa: E402
+from database.models import DBTournament  # noqa: E402
+from discord_impl.channel_type import ChannelType  # noqa: E402
+from discord_impl.permissions import Permissions  # noqa: E402
+from standin.generator import generate_tournament  # noqa: E402
+from fakes import Member, Server, Channel, Message, Client  # noqa: E402
+
+
+class UnreachableAccount:
+    def __init__(self):
+        self.calls = 0
+        account = self
+
+        class tournaments:
+            async def show(*args, **kwargs):
+                account.calls += 1
+                raise ConnectionRefusedError()
+        self.tournaments = tournaments
+
+
+def test_read_only_commands_answer_as_of(run, tables, monkeypatch):
+    raw = generate_tournament('double elimination', 8, progress=0.5, seed=0)
+    t_id = str(raw['id'])
+    snapshots.put(t_id, raw)
+    _, fetched_at = snapshots.get(t_id)
+    monkeypatch.setattr(TournamentSnapshot, 'recent_age', 0)  # too old to be served while Challonge answers
+
+    breaker = CircuitBreaker(failure_threshold=1)
+    monkeypatch.setattr(challonge_impl.accounts, 'breaker', breaker)
+    account = UnreachableAccount()
+
+    async def get_account(user_id):
+        return GuardedAccount(account), None
+    monkeypatch.setattr(commands.core, 'get_account', get_account)
+
+    server = Server([Member('0', 'Bot'), Member('1', 'Organizer')])
+    channel = Channel(server)
+    client = Client()
+    db_t = DBTournament(t_id, server.id, channel.id, 'role', 'host')
+
+    async def execute(name):
+        context_cache = {'permissions': Permissions.Organizer, 'channel_type': ChannelType.Tournament, 'db_tournament': db_t}
+        message = Message(server.members[1], channel, name)
+        command = cmds.find(name)
+        ok, exc = await command.validate_context(client, message, [], context_cache)
+        assert ok, exc
+        await command.execute(client, message, [], context_cache)
+
+    try:
+        run(execute('blocking'))
+        assert breaker.state == BreakerState.Open
+        run(execute('eta'))  # fails fast, without another request
+    finally:
+        snapshots.prune(t_id)
+        renders.prune(t_id)
+
+    assert account.calls == 1
+    assert [content.split('\n')[0] for _, content in client.sent] == [T_StaleSnapshot.format(fetched_at)] * 2
+    assert client.sent[0][1].split('\n')[1] == '✅ Blocking matches:'
+
+
+def test_other_commands_refuse_stale_data(run, tables, monkeypatch):
+    raw = generate_tournament('single elimination', 4, progress=0.5, seed=0)
+    t_id = str(raw['id'])
+    snapshots.put(t_id, raw)
+    monkeypatch.setattr(challonge_impl.accounts, 'breaker', CircuitBreaker(failure_threshold=1))
+
+    snapshot = TournamentSnapshot(GuardedAccount(UnreachableAccount()), t_id)
+    try:
+        with pytest.raises(ChallongeUnavailable):
+            run(snapshot.get())
+    finally:
+        snapshots.prune(t_id)
@@ -0,0 +1,67 @@
+"""The bot's Challonge account, sent to the stand-in server"""
+import asyncio
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+pytest.importorskip('challonge')
+aiohttp = pytest.importorskip('aiohttp')
+if not shutil.which('openssl'):
+    pytest.skip('openssl is needed to serve https', allow_module_level=True)
+
+import challonge_impl.accounts as accounts  # noqa: E402
+from challonge_impl.bracket import Tournament  # noqa: E402
+from database.models import DBUser  # noqa: E402
+from encoding import encoder  # noqa: E402
+from standin.server import StandInServer  # noqa: E402
+
+
+@pytest.fixture
+def certificate(tmpdir, monkeypatch):
+    """Self-signed certificate of 127.0.0.1, trusted by the client side"""
+    cert, key = str(tmpdir.join('cert.pem')), str(tmpdir.join('key.pem'))
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                           '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    monkeypatch.setenv('SSL_CERT_FILE', cert)
+    # recent aiohttp versions build their default context once, on import
+    verified = getattr(aiohttp.connector, '_SSL_CONTEXT_VERIFIED', None)
+    if verified is not None:
+        verified.load_verify_locations(cert)
+    return cert, key
+
+
+def test_account_calls(run, tables, certificate):
+    server = StandInServer()
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(*certificate)
+    tables._insert(table=DBUser, columns=DBUser.columns, values=('1', 'organizer', encoder.encrypt('key')))
+
+    async def scenario():
+        listening = await asyncio.get_event_loop().create_server(server.app().make_handler(), '127.0.0.1', 0, ssl=server_context)
+        previous = accounts.set_api_url('127.0.0.1:%d/v1' % listening.sockets[0].getsockname()[1])
+        try:
+            account, exc = await accounts.get('1')
+            assert exc is None
+            t = await account.tournaments.create('Smoke test', 'smoke_test', 'single elimination')
+            for name in ['Alice', 'Bob', 'Carol', 'Dave']:
+                await account.participants.create(t['id'], name)
+            await account.tournaments.start(t['id'])
+            raw = await account.tournaments.show(t['id'], include_participants=1, include_matches=1)
+            m = Tournament(raw).matches_in_state('open')[0]
+            await account.matches.update(t['id'], m.id, scores_csv='2-0', winner_id=m.player1_id)
+            return Tournament(await account.tournaments.show(t['id'], include_participants=1, include_matches=1)), m.id
+        finally:
+            accounts.set_api_url(previous)
+            del accounts.challonge_accounts[:]
+            listening.close()
+            await listening.wait_closed()
+
+    t, m_id = run(scenario())
+
+    assert t.state == 'underway'
+    assert [p.name for p in t.participants] == ['Alice', 'Bob', 'Carol', 'Dave']
+    assert t.match(m_id).state == 'complete'
+    assert server.requests_count == 10  # is_valid, create, 4 participants, start, show, update, show
@@ -0,0 +1,39 @@
+"""Discord member to Challonge participant mapping"""
+import pytest
+
+pytest.importorskip('challonge')
+
+from challonge_impl.bracket import Tournament  # noqa: E402
+from challonge_impl.utils import get_member_participant, backfill_tournament_users  # noqa: E402
+from standin.generator import generate_tournament  # noqa: E402
+from fakes import Member, Server  # noqa: E402
+
+
+def test_name_match_only_for_unmapped_participants(tables):
+    t = Tournament(generate_tournament('single elimination', 4, seed=0))
+    alice = t.participants[0]
+    owner = Member('1', alice.name)
+    namesake = Member('2', alice.name)
+
+    assert get_member_participant(t, owner, remember=False) is alice
+    assert tables.get_participant_id(str(t.id), owner.id) is None  # read-only commands don't map
+    assert get_member_participant(t, owner) is alice
+    assert tables.get_participant_id(str(t.id), owner.id) == alice.id
+
+    assert get_member_participant(t, namesake) is None
+    assert tables.get_participant_id(str(t.id), namesake.id) is None
+    assert get_member_participant(t, owner) is alice
+
+
+def test_backfill_maps_each_member_once(tables):
+    t = Tournament(generate_tournament('single elimination', 4, seed=0))
+    first, second = t.participants[0], t.participants[1]
+    renamed = Member('1', second.name)  # mapped to the first participant, now named like the second one
+    tables.add_tournament_user(str(t.id), renamed.id, first.id)
+    others = [Member(str(i + 2), p.name) for i, p in enumerate(t.participants[2:])]
+
+    backfill_tournament_users(t, Server([Member('0', 'Bot'), renamed] + others))
+
+    assert get_member_participant(t, renamed) is first
+    assert [get_member_participant(t, m) for m in others] == t.participants[2:]
+    assert tables.get_participant_discord_id(str(t.id), second.id) is None
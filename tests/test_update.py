@@ -0,0 +1,59 @@
+"""Challonge round trips of a score report"""
+import pytest
+
+pytest.importorskip('challonge')
+pytest.importorskip('discord')
+
+import commands.core  # noqa: E402
+from commands.core import cmds  # noqa: E402
+from commands.definitions.challonge import topic_updates  # noqa: E402
+from challonge_impl.scoreboard import scoreboards  # noqa: E402
+from challonge_impl.snapshot import snapshots  # noqa: E402
+from database.models import DBTournament  # noqa: E402
+from discord_impl.channel_type import ChannelType  # noqa: E402
+from discord_impl.permissions import Permissions  # noqa: E402
+from standin.state import StandInState  # noqa: E402
+from fakes import CountingAccount, Member, Server, Channel, Message, Client  # noqa: E402
+
+
+def test_update_round_trips(run, tables, monkeypatch):
+    state = StandInState()
+    t_id = str(state.create_tournament({'name': 'Round trips', 'tournament_type': 'single elimination'})['id'])
+    state.bulk_add_participants(t_id, [{'name': name} for name in ['Alice', 'Bob', 'Carol', 'Dave']])
+    state.start_tournament(t_id)
+    participants = {p['id']: p['name'] for p in state.participants[int(t_id)]}
+    first_match = next(m for m in state.matches[int(t_id)] if m['state'] == 'open')
+    player, opponent = participants[first_match['player1-id']], participants[first_match['player2-id']]
+
+    account = CountingAccount(state)
+
+    async def get_account(user_id):
+        return account, None
+    monkeypatch.setattr(commands.core, 'get_account', get_account)
+
+    members = [Member('0', 'Bot')] + [Member(str(i + 1), name) for i, name in enumerate(['Alice', 'Bob', 'Carol', 'Dave'])]
+    server = Server(members)
+    channel = Channel(server)
+    message = Message(server.get_member_named(player), channel)
+    client = Client()
+    context_cache = {'permissions': Permissions.Participant,
+                     'channel_type': ChannelType.Tournament,
+                     'db_tournament': DBTournament(t_id, server.id, channel.id, 'role', 'host')}
+
+    async def report():
+        command = cmds.find('update')
+        ok, exc = await command.validate_context(client, message, ['2-0', opponent], context_cache)
+        assert ok, exc
+        await command.execute(client, message, ['2-0', opponent], context_cache)
+
+    try:
+        run(report())
+        topic_updates.cancel(channel.id)
+        scoreboards.forget(channel.id)
+    finally:
+        snapshots.prune(t_id)
+
+    # validation read, score, then the read everything after the report comes from
+    assert account.calls == [('tournaments', 'show'), ('matches', 'update'), ('tournaments', 'show')]
+    assert first_match['state'] == 'complete'
+    assert client.sent[0][1].startswith('✅ These results have been uploaded to Challonge')